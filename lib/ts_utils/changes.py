@@ -0,0 +1,104 @@
+"""Determine which stubs are affected by the changes made since a git ref."""
+
+from __future__ import annotations
+
+import subprocess
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Final, NamedTuple
+
+from .imports import imported_stub_files
+from .metadata import get_dependency_graph
+from .paths import PYPROJECT_PATH, REQUIREMENTS_PATH, STDLIB_PATH, STUBS_PATH, TESTS_DIR
+from .utils import DistributionTests, get_gitignore_spec, spec_matches_path
+
+__all__ = ["AffectedStubs", "get_changed_paths", "stubs_affected_by_changes", "testcases_affected_by_changes"]
+
+# Changes to any of these paths affect how all stubs are tested
+_INFRASTRUCTURE_PATHS: Final = (Path("tests"), Path("lib"), PYPROJECT_PATH, REQUIREMENTS_PATH)
+
+
+class AffectedStubs(NamedTuple):
+    stdlib: bool
+    distributions: frozenset[str]
+    all_distributions: bool
+
+
+def _git_lines(*args: str) -> list[str]:
+    try:
+        result = subprocess.run(["git", *args], capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"'git {' '.join(args)}' failed: {e.stderr.strip()}") from None
+    return [line for line in result.stdout.splitlines() if line]
+
+
+def get_changed_paths(ref: str) -> list[Path]:
+    """Return the paths changed since the merge base of `ref` and the working tree.
+
+    This includes uncommitted and untracked (but not ignored) files.
+    """
+    changed = _git_lines("diff", "--name-only", "--merge-base", ref)
+    untracked = _git_lines("ls-files", "--others", "--exclude-standard")
+    return [Path(path) for path in sorted({*changed, *untracked})]
+
+
+def _all_distributions() -> frozenset[str]:
+    gitignore_spec = get_gitignore_spec()
+    return frozenset(dist.name for dist in STUBS_PATH.iterdir() if not spec_matches_path(gitignore_spec, dist))
+
+
+def stubs_affected_by_changes(ref: str) -> AffectedStubs:
+    """Return the stubs that need to be re-checked after the changes made since `ref`.
+
+    A change to a third-party distribution affects that distribution and all
+    distributions that (transitively) depend on it. A change to the stdlib,
+    or to typeshed's test infrastructure, affects everything.
+    """
+    all_distributions = _all_distributions()
+    changed_distributions: set[str] = set()
+    for path in get_changed_paths(ref):
+        if path.parts[:1] == STDLIB_PATH.parts or any(path.is_relative_to(p) for p in _INFRASTRUCTURE_PATHS):
+            return AffectedStubs(stdlib=True, distributions=all_distributions, all_distributions=True)
+        if path.parts[:1] == STUBS_PATH.parts and len(path.parts) > 2 and path.parts[1] in all_distributions:
+            changed_distributions.add(path.parts[1])
+
+    graph = get_dependency_graph()
+    affected = set(changed_distributions)
+    for distribution in changed_distributions:
+        # A distribution without a METADATA.toml file (e.g. one that's being added or removed) isn't in the graph
+        affected |= graph.transitive_dependents.get(distribution, frozenset())
+    return AffectedStubs(stdlib=False, distributions=frozenset(affected), all_distributions=affected == all_distributions)
+
+
+def testcases_affected_by_changes(package: DistributionTests, changed_paths: Iterable[Path]) -> list[Path] | None:
+    """Return the test case files of a package that are affected by changes to `changed_paths`.
+
+    A test case file is affected if it changed itself, or if it (transitively) imports
+    a changed stub file. Returns None if all test cases may be affected, e.g. after
+    a change to a METADATA.toml file, the VERSIONS file or the test infrastructure.
+    """
+    changed_test_cases: set[Path] = set()
+    changed_stubs: set[Path] = set()
+    for path in changed_paths:
+        if path.parts[:1] not in (STDLIB_PATH.parts, STUBS_PATH.parts):
+            return None
+        if path.is_relative_to(package.test_cases_path):
+            changed_test_cases.add(path)
+        elif TESTS_DIR in path.parts:
+            # Other packages' test cases, allowlists etc. don't affect this package's test cases
+            continue
+        elif path.suffix == ".pyi" and path.exists():
+            changed_stubs.add(path)
+        else:
+            # Includes deleted stubs, which the test cases can't be found to import anymore
+            return None
+
+    affected: list[Path] = []
+    for test_case in sorted(package.test_cases_path.rglob("*.py")):
+        if test_case in changed_test_cases:
+            affected.append(test_case)
+            continue
+        stub_files = imported_stub_files(test_case, None if package.is_stdlib else package.name)
+        if stub_files is None or not stub_files.isdisjoint(changed_stubs):
+            affected.append(test_case)
+    return affected
@@ -0,0 +1,54 @@
+"""Content fingerprints of stubs, used to tell whether recorded test results are still valid."""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+from pathlib import Path
+from typing import Final
+
+from .metadata import get_recursive_requirements
+from .paths import distribution_path
+
+__all__ = ["directory_fingerprint", "distribution_fingerprint", "fingerprint"]
+
+# Generated files that may appear inside a stubs directory, and are skipped.
+# (Don't use .gitignore for this: its "venv/" pattern would skip stdlib/venv.)
+_IGNORED_NAMES: Final = frozenset({"__pycache__", ".mypy_cache"})
+
+
+def fingerprint(*parts: str) -> str:
+    """Combine several strings (typically other fingerprints) into a single fingerprint."""
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part.encode())
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+@functools.cache
+def directory_fingerprint(directory: Path) -> str:
+    """Return a fingerprint of the names and contents of all files below a directory.
+
+    Generated files, such as those in __pycache__ directories, are skipped.
+    """
+    hasher = hashlib.sha256()
+    for path in sorted(directory.rglob("*")):
+        if path.is_dir() or not _IGNORED_NAMES.isdisjoint(path.relative_to(directory).parts):
+            continue
+        hasher.update(path.relative_to(directory).as_posix().encode())
+        hasher.update(b"\0")
+        hasher.update(hashlib.sha256(path.read_bytes()).digest())
+    return hasher.hexdigest()
+
+
+@functools.cache
+def distribution_fingerprint(distribution: str) -> str:
+    """Return a fingerprint of a distribution and all the typeshed stubs it depends on.
+
+    This covers the stubs, the METADATA.toml file and the @tests directory
+    (allowlists and test cases) of each of these distributions.
+    """
+    requirements = get_recursive_requirements(distribution)
+    names = sorted({distribution, *(requirement.name for requirement in requirements.typeshed_pkgs)})
+    return fingerprint(*(f"{name}={directory_fingerprint(distribution_path(name))}" for name in names))
@@ -0,0 +1,96 @@
+"""Find the stub files that a file (transitively) imports."""
+
+from __future__ import annotations
+
+import ast
+import functools
+from pathlib import Path
+from typing import Final
+
+from .metadata import get_recursive_requirements
+from .paths import STDLIB_PATH
+from .stubs import StdlibStubFile, StubFile, path_stubs, third_party_stubs
+
+__all__ = ["IMPLICIT_IMPORTS", "imported_stub_files", "stub_modules"]
+
+# Modules that mypy always loads, whether they are imported or not
+IMPLICIT_IMPORTS: Final = (
+    "_collections_abc",
+    "_typeshed",
+    "abc",
+    "builtins",
+    "collections",
+    "collections.abc",
+    "mypy_extensions",
+    "sys",
+    "types",
+    "typing",
+    "typing_extensions",
+)
+
+
+@functools.cache
+def stub_modules(distribution: str | None = None) -> dict[str, Path]:
+    """Return the stub file of every module that is visible to a distribution's test cases.
+
+    These are the stdlib stubs and the stubs of mypy-extensions, plus the stubs of the
+    distribution and its typeshed dependencies. Pass None for the stdlib test cases.
+    """
+    stubs: list[StubFile] = [StdlibStubFile(path) for path in path_stubs(STDLIB_PATH)]
+    distributions = {"mypy-extensions"}
+    if distribution is not None:
+        requirements = get_recursive_requirements(distribution)
+        distributions |= {distribution, *(requirement.name for requirement in requirements.typeshed_pkgs)}
+    for name in sorted(distributions):
+        stubs += third_party_stubs(name)
+    return {stub.module_name: stub.path for stub in stubs}
+
+
+def _with_parents(module_name: str) -> list[str]:
+    """Return the modules that importing `module_name` imports: e.g. a, a.b and a.b.c for a.b.c."""
+    parts = module_name.split(".")
+    return [".".join(parts[:i]) for i in range(1, len(parts) + 1) if parts[0]]
+
+
+@functools.cache
+def _imported_names(path: Path, module_name: str) -> frozenset[str]:
+    """Return the names of all modules a file might import, regardless of any version checks.
+
+    `module_name` is the name of the module the file defines, used to resolve relative imports.
+    Raises SyntaxError if the file can't be parsed.
+    """
+    tree = ast.parse(path.read_text(encoding="UTF-8"), filename=str(path))
+    package_parts = module_name.split(".") if path.stem == "__init__" else module_name.split(".")[:-1]
+    names: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                names.update(_with_parents(alias.name))
+        elif isinstance(node, ast.ImportFrom):
+            base_parts = package_parts[: len(package_parts) - node.level + 1] if node.level else []
+            base = ".".join([*base_parts, *([node.module] if node.module else [])])
+            names.update(_with_parents(base))
+            # "from a import b" may import either the module a.b, or the name b defined in a
+            names.update(f"{base}.{alias.name}" for alias in node.names if base and alias.name != "*")
+    return frozenset(names)
+
+
+def imported_stub_files(path: Path, distribution: str | None = None) -> frozenset[Path] | None:
+    """Return the stub files that the file at `path` (transitively) imports, including IMPLICIT_IMPORTS.
+
+    `distribution` determines which stubs are visible, see stub_modules().
+    Returns None if the imports can't be determined, because a file can't be parsed.
+    """
+    modules = stub_modules(distribution)
+    seen: set[str] = set()
+    try:
+        to_visit = [*_imported_names(path, ""), *IMPLICIT_IMPORTS]
+        while to_visit:
+            name = to_visit.pop()
+            if name in seen or name not in modules:
+                continue
+            seen.add(name)
+            to_visit.extend(_imported_names(modules[name], name))
+    except SyntaxError:
+        return None
+    return frozenset(modules[name] for name in seen)
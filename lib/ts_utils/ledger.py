@@ -0,0 +1,109 @@
+"""A persistent record of the results and durations of individual test runs."""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import threading
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import NamedTuple
+
+__all__ = ["Ledger", "LedgerEntry", "Shard", "balanced_shards", "expected_durations", "read_durations"]
+
+
+class LedgerEntry(NamedTuple):
+    success: bool
+    duration: float  # In seconds
+    fingerprint: str  # Of everything the result depends on; see ts_utils.fingerprints
+
+
+class Ledger:
+    """The most recent result for each item (e.g. a distribution), stored in a JSON file.
+
+    The file is rewritten after every recorded result, so that an interrupted run
+    keeps all results recorded up to that point. Safe to use from multiple threads.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            data = json.loads(path.read_text(encoding="UTF-8"))
+            self._entries = {name: LedgerEntry(**entry) for name, entry in data.items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            # Missing, corrupt or outdated: start from scratch
+            self._entries = {}
+
+    def get(self, name: str) -> LedgerEntry | None:
+        with self._lock:
+            return self._entries.get(name)
+
+    def durations(self) -> dict[str, float]:
+        with self._lock:
+            return {name: entry.duration for name, entry in self._entries.items()}
+
+    def passed(self, name: str, fingerprint: str) -> bool:
+        """Return whether the most recent run of an item passed, with the same fingerprint."""
+        entry = self.get(name)
+        return entry is not None and entry.success and entry.fingerprint == fingerprint
+
+    def record(self, name: str, *, success: bool, duration: float, fingerprint: str) -> None:
+        with self._lock:
+            self._entries[name] = LedgerEntry(success, duration, fingerprint)
+            self._save()
+
+    def _save(self) -> None:
+        data = {name: entry._asdict() for name, entry in sorted(self._entries.items())}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write atomically, so that concurrent readers never see a partially written file
+        temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+        temp_path.write_text(json.dumps(data, indent=2), encoding="UTF-8")
+        temp_path.replace(self.path)
+
+
+def read_durations(path: Path) -> dict[str, float]:
+    """Read the duration of each item from a ledger file, without ever writing to it.
+
+    Raises OSError if the file can't be read, and ValueError if it isn't a ledger file.
+    """
+    data = json.loads(path.read_text(encoding="UTF-8"))
+    try:
+        return {name: float(entry["duration"]) for name, entry in data.items()}
+    except (AttributeError, KeyError, TypeError) as e:
+        raise ValueError(f"{path} is not a ledger file") from e
+
+
+class Shard(NamedTuple):
+    items: list[str]
+    expected_duration: float  # In seconds
+
+
+def expected_durations(items: Sequence[str], durations: Mapping[str, float]) -> dict[str, float]:
+    """Return the expected duration of each item, sorted longest first.
+
+    Items without a recorded duration are assumed to take the median recorded duration.
+    """
+    known_durations = [durations[item] for item in items if item in durations]
+    default_duration = statistics.median(known_durations) if known_durations else 1.0
+    expected = {item: durations.get(item, default_duration) for item in items}
+    return {item: expected[item] for item in sorted(items, key=lambda item: (-expected[item], item))}
+
+
+def balanced_shards(items: Sequence[str], durations: Mapping[str, float], num_shards: int) -> list[Shard]:
+    """Split items into shards whose total expected durations are as equal as possible.
+
+    Items are assigned longest first (see expected_durations()), each to the shard
+    with the smallest total so far. The split only depends on the arguments, so all
+    shards of a CI job agree on it, as long as they use the same durations: take those
+    from a fixed history (see read_durations()), never from a ledger the shards record to.
+    This also predicts how long it takes `num_shards` workers to process all items.
+    """
+    shard_items: list[list[str]] = [[] for _ in range(num_shards)]
+    totals = [0.0] * num_shards
+    for item, duration in expected_durations(items, durations).items():
+        index = min(range(num_shards), key=lambda index: (totals[index], index))
+        shard_items[index].append(item)
+        totals[index] += duration
+    return [Shard(sorted(shard), total) for shard, total in zip(shard_items, totals, strict=True)]
@@ -5,12 +5,17 @@
 
 from __future__ import annotations
 
+import atexit
 import datetime
 import functools
+import hashlib
+import json
+import os
+import pickle
 import re
 import sys
 import urllib.parse
-from collections.abc import Mapping
+from collections.abc import Iterable, Mapping
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Annotated, Any, Final, NamedTuple, TypeGuard, cast, final
@@ -20,21 +25,25 @@ if sys.version_info >= (3, 11):
 else:
     import tomli as tomllib
 
+import packaging
 import tomlkit
 from packaging.requirements import Requirement
 from packaging.specifiers import Specifier
 
-from .paths import PYPROJECT_PATH, STUBS_PATH, distribution_path
+from .paths import CACHE_PATH, PYPROJECT_PATH, STUBS_PATH, distribution_path
 
 __all__ = [
+    "DependencyGraph",
     "NoSuchStubError",
     "PackageDependencies",
     "StubMetadata",
     "StubtestSettings",
+    "get_dependency_graph",
     "get_oldest_supported_python",
     "get_recursive_requirements",
     "read_dependencies",
     "read_metadata",
+    "read_metadata_toml",
     "read_stubtest_settings",
 ]
 
@@ -70,6 +79,20 @@ def metadata_path(distribution: str) -> Path:
     return distribution_path(distribution) / "METADATA.toml"
 
 
+@functools.cache
+def read_metadata_toml(distribution: str) -> dict[str, Any]:
+    """Return the parsed contents of a distribution's METADATA.toml file.
+
+    The file is parsed only once per process. Callers must not modify the returned dictionary.
+    Use `update_metadata` to make changes to the file.
+    """
+    try:
+        with metadata_path(distribution).open("rb") as f:
+            return tomllib.load(f)
+    except FileNotFoundError:
+        raise NoSuchStubError(f"Typeshed has no stubs for {distribution!r}!") from None
+
+
 @final
 @dataclass(frozen=True)
 class StubtestSettings:
@@ -101,8 +124,11 @@ class StubtestSettings:
 @functools.cache
 def read_stubtest_settings(distribution: str) -> StubtestSettings:
     """Return an object describing the stubtest settings for a single stubs distribution."""
-    with metadata_path(distribution).open("rb") as f:
-        data: dict[str, object] = tomllib.load(f).get("tool", {}).get("stubtest", {})
+    snapshot_metadata = _get_metadata_snapshot().get(distribution)
+    if snapshot_metadata is not None:
+        return snapshot_metadata.stubtest_settings
+
+    data: dict[str, object] = read_metadata_toml(distribution).get("tool", {}).get("stubtest", {})
 
     skip: object = data.get("skip", False)
     apt_dependencies: object = data.get("apt-dependencies", [])
@@ -253,17 +279,20 @@ def read_metadata(distribution: str) -> StubMetadata:
     but does no parsing, transforming or normalization of the metadata.
     Use `read_dependencies` if you need to parse the dependencies
     given in the `dependencies` field, for example.
+
+    Validated metadata is kept in an on-disk snapshot, so that it doesn't have to be
+    parsed and validated again in later runs while the METADATA.toml file is unchanged.
     """
-    try:
-        with metadata_path(distribution).open("rb") as f:
-            # This cast is necessary for pyright to understand that the
-            # variable is a dict with object values. Just using
-            # `data: dict[str, object] = tomlkit.load(f)` doesn't work because
-            # pyright still infers TOMLDocument which derives from
-            # dict[Unknown, Unknown].
-            data = cast(dict[str, object], tomlkit.load(f))
-    except FileNotFoundError:
-        raise NoSuchStubError(f"Typeshed has no stubs for {distribution!r}!") from None
+    snapshot = _get_metadata_snapshot()
+    metadata = snapshot.get(distribution)
+    if metadata is None:
+        metadata = _read_and_validate_metadata(distribution)
+        snapshot.add(metadata)
+    return metadata
+
+
+def _read_and_validate_metadata(distribution: str) -> StubMetadata:
+    data: dict[str, object] = read_metadata_toml(distribution)
 
     unknown_metadata_fields = data.keys() - _KNOWN_METADATA_FIELDS
     assert not unknown_metadata_fields, f"Unexpected keys in METADATA.toml for {distribution!r}: {unknown_metadata_fields}"
@@ -379,6 +408,80 @@ def read_metadata(distribution: str) -> StubMetadata:
     )
 
 
+_METADATA_SNAPSHOT_PATH: Final = CACHE_PATH / "metadata_snapshot.pickle"
+_METADATA_SNAPSHOT_PROTOCOL: Final = pickle.HIGHEST_PROTOCOL
+
+
+@functools.cache
+def _metadata_file_hash(distribution: str) -> str | None:
+    try:
+        return hashlib.sha256(metadata_path(distribution).read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+class _MetadataSnapshot:
+    """Validated metadata of stubs distributions, persisted between runs.
+
+    Each entry is only reused while the METADATA.toml file it was read from is unchanged.
+    The whole snapshot is discarded if this module or typeshed's oldest supported
+    Python version changes, since both affect the validation. It's also discarded
+    if the interpreter, the pickle protocol or the version of packaging changes,
+    since the entries are pickled objects that contain packaging's requirements and specifiers.
+    """
+
+    def __init__(self) -> None:
+        key_parts = (
+            Path(__file__).read_bytes(),
+            get_oldest_supported_python().encode(),
+            sys.version.encode(),
+            str(_METADATA_SNAPSHOT_PROTOCOL).encode(),
+            packaging.__version__.encode(),
+        )
+        self._key = hashlib.sha256(b"\0".join(key_parts)).hexdigest()
+        self._entries: dict[str, tuple[str, StubMetadata]] = {}
+        self._modified = False
+        try:
+            with _METADATA_SNAPSHOT_PATH.open("rb") as f:
+                # The key is pickled on its own, so that stale entries are never unpickled
+                if pickle.load(f) != self._key:
+                    return
+                entries = pickle.load(f)
+        except Exception:  # Missing, truncated or incompatible snapshots are simply rebuilt
+            return
+        if isinstance(entries, dict):
+            self._entries = entries
+
+    def get(self, distribution: str) -> StubMetadata | None:
+        entry = self._entries.get(distribution)
+        if entry is None:
+            return None
+        file_hash, metadata = entry
+        return metadata if file_hash == _metadata_file_hash(distribution) else None
+
+    def add(self, metadata: StubMetadata) -> None:
+        file_hash = _metadata_file_hash(metadata.distribution)
+        if file_hash is None:
+            return
+        self._entries[metadata.distribution] = (file_hash, metadata)
+        if not self._modified:
+            self._modified = True
+            atexit.register(self.save)
+
+    def save(self) -> None:
+        _METADATA_SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = _METADATA_SNAPSHOT_PATH.with_name(f"{_METADATA_SNAPSHOT_PATH.name}.{os.getpid()}")
+        with temp_path.open("wb") as f:
+            pickle.dump(self._key, f, protocol=_METADATA_SNAPSHOT_PROTOCOL)
+            pickle.dump(self._entries, f, protocol=_METADATA_SNAPSHOT_PROTOCOL)
+        temp_path.replace(_METADATA_SNAPSHOT_PATH)
+
+
+@functools.cache
+def _get_metadata_snapshot() -> _MetadataSnapshot:
+    return _MetadataSnapshot()
+
+
 def update_metadata(distribution: str, **new_values: object) -> dict[str, object]:
     """Update a distribution's METADATA.toml.
 
@@ -466,3 +569,127 @@ def get_recursive_requirements(package_name: str) -> PackageDependencies:
         typeshed.update(reqs.typeshed_pkgs)
         external.update(reqs.external_pkgs)
     return PackageDependencies(tuple(typeshed), tuple(external))
+
+
+_DEPENDENCY_GRAPH_CACHE: Final = CACHE_PATH / "dependency_graph.json"
+
+
+@final
+@dataclass(frozen=True)
+class DependencyGraph:
+    """The graph of typeshed-internal dependencies between all stubs distributions.
+
+    Don't construct instances directly; use the `get_dependency_graph` function.
+    """
+
+    dependencies: Mapping[str, frozenset[str]]
+    dependents: Mapping[str, frozenset[str]]
+    transitive_dependencies: Mapping[str, frozenset[str]]
+    transitive_dependents: Mapping[str, frozenset[str]]
+    topological_order: Annotated[tuple[str, ...], "Every distribution comes after all of its dependencies"]
+    strongly_connected_components: Annotated[tuple[frozenset[str], ...], "In topological order"]
+
+    @classmethod
+    def from_dependencies(cls, dependencies: Mapping[str, Iterable[str]]) -> DependencyGraph:
+        """Build the graph from each distribution's direct typeshed dependencies."""
+        forward = {dist: frozenset(deps) for dist, deps in dependencies.items()}
+        for deps in list(forward.values()):
+            for dep in deps:
+                forward.setdefault(dep, frozenset())
+        reverse: dict[str, set[str]] = {dist: set() for dist in forward}
+        for dist, deps in forward.items():
+            for dep in deps:
+                reverse[dep].add(dist)
+        backward = {dist: frozenset(dependents) for dist, dependents in reverse.items()}
+
+        components = _strongly_connected_components(forward)
+        return cls(
+            dependencies=forward,
+            dependents=backward,
+            transitive_dependencies=_transitive_closure(forward, components),
+            transitive_dependents=_transitive_closure(backward, components[::-1]),
+            topological_order=tuple(dist for component in components for dist in sorted(component)),
+            strongly_connected_components=components,
+        )
+
+
+def _strongly_connected_components(graph: Mapping[str, frozenset[str]]) -> tuple[frozenset[str], ...]:
+    """Find the strongly connected components of a graph using Tarjan's algorithm.
+
+    The components are returned so that every component comes after all components it has edges to.
+    """
+    index: dict[str, int] = {}
+    lowlink: dict[str, int] = {}
+    stack: list[str] = []
+    on_stack: set[str] = set()
+    components: list[frozenset[str]] = []
+
+    def visit(node: str) -> None:
+        index[node] = lowlink[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+        for successor in sorted(graph[node]):
+            if successor not in index:
+                visit(successor)
+                lowlink[node] = min(lowlink[node], lowlink[successor])
+            elif successor in on_stack:
+                lowlink[node] = min(lowlink[node], index[successor])
+        if lowlink[node] == index[node]:
+            component: set[str] = set()
+            while True:
+                member = stack.pop()
+                on_stack.remove(member)
+                component.add(member)
+                if member == node:
+                    break
+            components.append(frozenset(component))
+
+    for node in sorted(graph):
+        if node not in index:
+            visit(node)
+    return tuple(components)
+
+
+def _transitive_closure(graph: Mapping[str, frozenset[str]], components: Iterable[frozenset[str]]) -> dict[str, frozenset[str]]:
+    """Compute everything reachable from each node.
+
+    `components` must be ordered so that each component comes after all components it has edges to.
+    """
+    closure: dict[str, frozenset[str]] = {}
+    for component in components:
+        reachable: set[str] = set()
+        for node in component:
+            for successor in graph[node]:
+                if successor in component:
+                    # Part of a cycle, so every member of the component can reach itself
+                    reachable |= component
+                else:
+                    reachable.add(successor)
+                    reachable |= closure[successor]
+        for node in component:
+            closure[node] = frozenset(reachable)
+    return closure
+
+
+@functools.cache
+def get_dependency_graph() -> DependencyGraph:
+    """Return the graph of typeshed-internal dependencies between all stubs distributions.
+
+    The direct dependencies are cached on disk, and are only read from the METADATA.toml
+    files again if any of those files has been added, removed or modified since.
+    """
+    mtimes = {path.parent.name: path.stat().st_mtime_ns for path in sorted(STUBS_PATH.glob("*/METADATA.toml"))}
+    try:
+        cached = json.loads(_DEPENDENCY_GRAPH_CACHE.read_text(encoding="UTF-8"))
+    except (OSError, ValueError):
+        cached = None
+
+    if isinstance(cached, dict) and cached.get("metadata_mtimes") == mtimes:
+        dependencies: dict[str, list[str]] = cached["dependencies"]
+    else:
+        dependencies = {dist: sorted(req.name for req in read_dependencies(dist).typeshed_pkgs) for dist in mtimes}
+        _DEPENDENCY_GRAPH_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = _DEPENDENCY_GRAPH_CACHE.with_name(f"{_DEPENDENCY_GRAPH_CACHE.name}.{os.getpid()}")
+        temp_path.write_text(json.dumps({"metadata_mtimes": mtimes, "dependencies": dependencies}), encoding="UTF-8")
+        temp_path.replace(_DEPENDENCY_GRAPH_CACHE)
+    return DependencyGraph.from_dependencies(dependencies)
@@ -14,6 +14,11 @@ REQUIREMENTS_PATH: Final = TS_BASE_PATH / "requirements-tests.txt"
 GITIGNORE_PATH: Final = TS_BASE_PATH / ".gitignore"
 PYRIGHT_CONFIG: Final = TS_BASE_PATH / "pyrightconfig.stricter.json"
 
+# Local, disposable state (caches, histories) kept by the test scripts between runs
+CACHE_PATH: Final = TS_BASE_PATH / ".typeshed_cache"
+STUBTEST_LEDGER_PATH: Final = CACHE_PATH / "stubtest_ledger.json"
+REGR_TEST_LEDGER_PATH: Final = CACHE_PATH / "regr_test_ledger.json"
+
 TESTS_DIR: Final = "@tests"
 TEST_CASES_DIR: Final = "test_cases"
 
@@ -7,8 +7,9 @@ from collections.abc import Iterable
 
 from packaging.requirements import Requirement
 
-from ts_utils.metadata import read_dependencies, read_stubtest_settings
+from ts_utils.metadata import get_recursive_requirements, read_dependencies, read_metadata, read_stubtest_settings
 from ts_utils.paths import STUBS_PATH
+from ts_utils.utils import get_mypy_req
 
 
 def get_external_stub_requirements(distributions: Iterable[str] = ()) -> set[Requirement]:
@@ -27,3 +28,24 @@ def get_stubtest_system_requirements(distributions: Iterable[str] = (), platform
             [read_stubtest_settings(distribution).system_requirements_for_platform(platform) for distribution in distributions]
         )
     )
+
+
+def get_stubtest_install_requirements(distribution: str) -> list[str]:
+    """Return the requirements that stubtest needs installed to test a distribution."""
+    metadata = read_metadata(distribution)
+    stubtest_settings = metadata.stubtest_settings
+    dist_extras = ", ".join(stubtest_settings.extras)
+    dist_req = f"{distribution}[{dist_extras}]{metadata.version_spec}"
+
+    # We need stubtest to be able to import the package, so install mypy into the venv
+    # Hopefully mypy continues to not need too many dependencies
+    requirements = [dist_req, get_mypy_req()]
+    # Internal requirements are added to MYPYPATH
+    requirements.extend(str(r) for r in get_recursive_requirements(distribution).external_pkgs)
+    requirements.extend(stubtest_settings.stubtest_dependencies)
+
+    # Since the "gdb" Python package is available only inside GDB, it is not
+    # possible to install it through pip, so stub tests cannot install it.
+    if distribution == "gdb":
+        requirements.remove(dist_req)
+    return requirements
@@ -0,0 +1,55 @@
+"""A persistent cache of passing test results.
+
+A test run is identified by a fingerprint of everything its result depends on
+(see ts_utils.fingerprints). Only passing results are cached: failing tests are
+always run again, so that their output is shown.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Final
+
+from .paths import CACHE_PATH
+
+__all__ = ["RESULT_CACHE_PATH", "ResultCache"]
+
+RESULT_CACHE_PATH: Final = CACHE_PATH / "results"
+
+DEFAULT_MAX_AGE: Final = 30 * 24 * 60 * 60
+
+
+class ResultCache:
+    """The fingerprints of all test runs of one kind (e.g. "stubtest") that passed.
+
+    Each passing result is an empty file, named after the fingerprint, whose mtime
+    records when it was last used. It's safe to use from multiple threads or processes.
+    """
+
+    def __init__(self, kind: str) -> None:
+        self.directory = RESULT_CACHE_PATH / kind
+
+    def passed(self, fingerprint: str) -> bool:
+        """Return whether a test run with this fingerprint passed before."""
+        try:
+            os.utime(self.directory / fingerprint)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def record_pass(self, fingerprint: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / fingerprint).touch()
+
+    def prune(self, *, max_age: float = DEFAULT_MAX_AGE) -> int:
+        """Remove results that haven't been used for `max_age` seconds, and return how many were removed."""
+        if not self.directory.is_dir():
+            return 0
+        now = time.time()
+        removed = 0
+        for path in self.directory.iterdir():
+            if now - path.stat().st_mtime > max_age:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import argparse
 import functools
 import re
 import sys
@@ -195,6 +196,22 @@ def _parse_version(v_str: str) -> tuple[int, int]:
     return int(m.group(1)), int(m.group(2))
 
 
+# ====================================================================
+# Command line arguments
+# ====================================================================
+
+
+def positive_int(cmd_arg: str) -> int:
+    """Parse a CLI argument that is intended to be a positive integer."""
+    try:
+        value = int(cmd_arg)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{cmd_arg!r} is not an integer") from None
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"{cmd_arg!r} must be at least 1")
+    return value
+
+
 # ====================================================================
 # Test Directories
 # ====================================================================
@@ -0,0 +1,154 @@
+"""A persistent, content-addressed cache of virtual environments.
+
+The test scripts create many virtual environments, most of which have exactly
+the same contents as one created during a previous run. Venvs in the cache are
+identified by a hash of everything that determines their contents, so they can
+be reused by any script that needs the same set of packages.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterable, Mapping
+from pathlib import Path
+from typing import Final, NamedTuple
+
+from .paths import CACHE_PATH
+from .utils import get_mypy_req
+
+__all__ = ["VENV_CACHE_PATH", "cached_venv", "cached_venv_path", "prune_venv_cache", "venv_cache_key"]
+
+VENV_CACHE_PATH: Final = CACHE_PATH / "venvs"
+
+# Venvs are rebuilt after this many seconds, even if they are used all the time,
+# so that packages with unpinned requirements are updated eventually
+VENV_REFRESH_INTERVAL: Final = 7 * 24 * 60 * 60
+
+DEFAULT_MAX_SIZE: Final = 10 * 1024**3
+DEFAULT_MAX_AGE: Final = 7 * 24 * 60 * 60
+
+# Venvs that were used more recently than this are never evicted,
+# since another test run might be using them right now
+_IN_USE_GRACE_PERIOD: Final = 60 * 60
+
+# Written into a venv once it is complete. Its mtime records when the venv was last used.
+_METADATA_FILE: Final = "typeshed-venv.json"
+_BUILD_DIR_SUFFIX: Final = ".build"
+
+# Environment variables that affect which packages get installed into a venv
+_INSTALL_ENVIRONMENT_VARIABLES: Final = (
+    "PIP_EXTRA_INDEX_URL",
+    "PIP_FIND_LINKS",
+    "PIP_INDEX_URL",
+    "PIP_NO_INDEX",
+    "UV_DEFAULT_INDEX",
+    "UV_EXTRA_INDEX_URL",
+    "UV_FIND_LINKS",
+    "UV_INDEX",
+    "UV_INDEX_URL",
+    "UV_NO_INDEX",
+)
+
+
+class _CachedVenv(NamedTuple):
+    path: Path
+    size: int
+    last_used: float
+
+
+def venv_cache_key(kind: str, requirements: Iterable[str], install_environment: Mapping[str, str] | None = None) -> str:
+    """Return the cache key for a venv with mypy and `requirements` installed into it.
+
+    `kind` separates venvs that different scripts set up in different ways.
+    `install_environment` holds any extra environment variables the packages
+    are installed with.
+    """
+    environment = {var: os.environ[var] for var in _INSTALL_ENVIRONMENT_VARIABLES if var in os.environ}
+    environment.update(install_environment or {})
+    key_data = {
+        "kind": kind,
+        "python": [sys.implementation.name, platform.python_version(), sys.platform, platform.machine()],
+        "mypy": get_mypy_req(),
+        "requirements": sorted(set(requirements)),
+        "install_environment": sorted(environment.items()),
+        "refresh_epoch": int(time.time() // VENV_REFRESH_INTERVAL),
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def cached_venv_path(key: str) -> Path:
+    """Return the path the venv with the given key has (or will have) in the cache."""
+    return VENV_CACHE_PATH / key
+
+
+def cached_venv(key: str, build: Callable[[Path], None]) -> Path:
+    """Return the path to the cached venv with the given key, building it first if necessary.
+
+    `build` is called with a path that doesn't exist yet, and must create the venv there.
+    The finished venv is then moved into the cache, so scripts with shebang lines inside
+    it won't work: use `python -m` to run tools installed into it.
+
+    It's safe to call this concurrently from multiple threads or processes.
+    """
+    venv_dir = cached_venv_path(key)
+    metadata_file = venv_dir / _METADATA_FILE
+    if not metadata_file.exists():
+        VENV_CACHE_PATH.mkdir(parents=True, exist_ok=True)
+        build_dir = Path(tempfile.mkdtemp(prefix=f"{key}-", suffix=_BUILD_DIR_SUFFIX, dir=VENV_CACHE_PATH))
+        try:
+            new_venv = build_dir / "venv"
+            build(new_venv)
+            size = sum(path.stat().st_size for path in new_venv.rglob("*") if path.is_file() and not path.is_symlink())
+            (new_venv / _METADATA_FILE).write_text(json.dumps({"size": size}), encoding="UTF-8")
+            try:
+                new_venv.rename(venv_dir)
+            except OSError:
+                # Another process finished building the same venv first; use that one
+                if not metadata_file.exists():
+                    raise
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+    os.utime(metadata_file)
+    return venv_dir
+
+
+def prune_venv_cache(*, max_size: int = DEFAULT_MAX_SIZE, max_age: float = DEFAULT_MAX_AGE) -> list[Path]:
+    """Evict venvs from the cache, and return the paths of the venvs that were removed.
+
+    Venvs that haven't been used for `max_age` seconds are removed, and then the least
+    recently used venvs are removed until the cache takes up at most `max_size` bytes.
+    Leftovers from interrupted builds are cleaned up as well.
+    """
+    if not VENV_CACHE_PATH.is_dir():
+        return []
+
+    now = time.time()
+    venvs: list[_CachedVenv] = []
+    for path in VENV_CACHE_PATH.iterdir():
+        metadata_file = path / _METADATA_FILE
+        try:
+            size = json.loads(metadata_file.read_text(encoding="UTF-8"))["size"]
+            last_used = metadata_file.stat().st_mtime
+        except (OSError, ValueError, KeyError):
+            if path.name.endswith(_BUILD_DIR_SUFFIX) and now - path.stat().st_mtime > _IN_USE_GRACE_PERIOD:
+                shutil.rmtree(path, ignore_errors=True)
+            continue
+        venvs.append(_CachedVenv(path, size, last_used))
+
+    removed: list[Path] = []
+    total_size = sum(venv.size for venv in venvs)
+    for venv in sorted(venvs, key=lambda venv: venv.last_used):
+        if now - venv.last_used < _IN_USE_GRACE_PERIOD:
+            break
+        if total_size > max_size or now - venv.last_used > max_age:
+            shutil.rmtree(venv.path, ignore_errors=True)
+            total_size -= venv.size
+            removed.append(venv.path)
+    return removed
@@ -0,0 +1,119 @@
+"""Support for installing test requirements offline, from a local directory of wheels.
+
+A wheelhouse is built once (with network access) by `scripts/build_wheelhouse.py`.
+After `use_wheelhouse()` has been called, every `uv` and `pip` process started by
+the test scripts installs packages from the wheelhouse only, without accessing
+the package index.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Final, NamedTuple
+
+from .metadata import get_recursive_requirements, read_metadata
+from .requirements import get_stubtest_install_requirements
+from .utils import get_mypy_req, venv_python
+
+__all__ = ["RequirementSet", "WheelhouseBuilder", "use_wheelhouse", "wheelhouse_directory", "wheelhouse_requirement_sets"]
+
+# Packages that `uv venv --seed` installs into new venvs
+_SEED_PACKAGES: Final = ("pip", "setuptools", "wheel")
+
+
+class RequirementSet(NamedTuple):
+    """A set of requirements that are installed together into a single venv."""
+
+    description: str
+    requirements: tuple[str, ...]
+    install_environment: tuple[tuple[str, str], ...] = ()
+
+
+def wheelhouse_requirement_sets(distributions: Iterable[str]) -> list[RequirementSet]:
+    """Return all sets of requirements that the test scripts may install for the given distributions."""
+    requirement_sets = {RequirementSet("venv seed packages", _SEED_PACKAGES)}
+    for distribution in distributions:
+        external_requirements = sorted(str(r) for r in get_recursive_requirements(distribution).external_pkgs)
+        if external_requirements:
+            requirement_sets.add(RequirementSet(distribution, (get_mypy_req(), *external_requirements)))
+        stubtest_settings = read_metadata(distribution).stubtest_settings
+        if not stubtest_settings.skip:
+            requirement_sets.add(
+                RequirementSet(
+                    f"{distribution} (stubtest)",
+                    tuple(get_stubtest_install_requirements(distribution)),
+                    tuple(sorted(stubtest_settings.install_environment.items())),
+                )
+            )
+    return sorted(requirement_sets)
+
+
+class WheelhouseBuilder:
+    """Resolves requirements and stores wheels for them (and all their dependencies) in a wheelhouse.
+
+    Requirements only available as source distributions are built into wheels,
+    so that installing from the wheelhouse never needs network access for build dependencies.
+    """
+
+    def __init__(self, wheelhouse: Path) -> None:
+        self.wheelhouse = wheelhouse.resolve()
+        self.wheelhouse.mkdir(parents=True, exist_ok=True)
+        self._tempdir = tempfile.TemporaryDirectory(prefix="wheelhouse-")
+        # Use a venv with pip seeded for the running interpreter, so that the wheels match it
+        self._venv_dir = Path(self._tempdir.name) / "venv"
+        subprocess.run(
+            ["uv", "venv", "--seed", "--quiet", "--python", sys.executable, str(self._venv_dir)], check=True, capture_output=True
+        )
+
+    def add(self, requirement_set: RequirementSet) -> None:
+        """Add wheels for a set of requirements to the wheelhouse.
+
+        Raises subprocess.CalledProcessError if the requirements can't be resolved or built.
+        """
+        with tempfile.TemporaryDirectory(dir=self._tempdir.name) as wheel_dir:
+            pip_command = [
+                str(venv_python(self._venv_dir)),
+                "-m",
+                "pip",
+                "wheel",
+                "--disable-pip-version-check",
+                "--wheel-dir",
+                wheel_dir,
+                # Reuse wheels that are already in the wheelhouse rather than building them again
+                "--find-links",
+                str(self.wheelhouse),
+                *requirement_set.requirements,
+            ]
+            env = os.environ | dict(requirement_set.install_environment)
+            subprocess.run(pip_command, env=env, check=True, capture_output=True, text=True)
+            # Move the wheels into place one by one, so that concurrent builds never see a partial file
+            for wheel in Path(wheel_dir).iterdir():
+                wheel.replace(self.wheelhouse / wheel.name)
+
+    def close(self) -> None:
+        self._tempdir.cleanup()
+
+
+def wheelhouse_directory(cmd_arg: str) -> Path:
+    """Parse a CLI argument that is intended to point to an existing wheelhouse."""
+    path = Path(cmd_arg)
+    if not path.is_dir():
+        raise argparse.ArgumentTypeError(f"'{path}' is not a directory; create it with scripts/build_wheelhouse.py")
+    return path
+
+
+def use_wheelhouse(wheelhouse: Path) -> None:
+    """Make all `uv` and `pip` processes started from now on install from `wheelhouse` only.
+
+    This is the equivalent of passing `--no-index --find-links WHEELHOUSE` to every installer.
+    The settings are also part of the key of cached venvs, so venvs built from the wheelhouse
+    are never mixed up with venvs built from the package index.
+    """
+    location = str(wheelhouse.resolve())
+    os.environ.update({"UV_NO_INDEX": "1", "UV_FIND_LINKS": location, "PIP_NO_INDEX": "1", "PIP_FIND_LINKS": location})
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+"""Build a wheelhouse for running typeshed's tests offline.
+
+This downloads (and, where necessary, builds) wheels for every package that
+mypy_test.py, regr_test.py and stubtest_third_party.py may install, for the
+running Python interpreter and platform. Afterwards, pass `--wheelhouse DIR`
+to those scripts to install everything from the wheelhouse, without network access.
+
+Basic usage:
+$ python3 scripts/build_wheelhouse.py <wheelhouse directory> [<distribution> ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from ts_utils.paths import STUBS_PATH
+from ts_utils.utils import get_gitignore_spec, positive_int, print_error, print_success_msg, spec_matches_path
+from ts_utils.wheelhouse import WheelhouseBuilder, wheelhouse_requirement_sets
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a wheelhouse for running typeshed's tests offline")
+    parser.add_argument("wheelhouse", type=Path, help="directory to store the wheels in (created if necessary)")
+    parser.add_argument(
+        "distributions",
+        metavar="DISTRIBUTION",
+        nargs="*",
+        help="only include the requirements of these distributions (defaults to all distributions)",
+    )
+    parser.add_argument("-j", "--jobs", type=positive_int, default=os.cpu_count() or 1, help="number of concurrent pip processes")
+    args = parser.parse_args()
+
+    if args.distributions:
+        distributions = args.distributions
+    else:
+        gitignore_spec = get_gitignore_spec()
+        distributions = sorted(d.name for d in STUBS_PATH.iterdir() if not spec_matches_path(gitignore_spec, d))
+
+    requirement_sets = wheelhouse_requirement_sets(distributions)
+    print(f"Building wheels for {len(requirement_sets)} requirement sets in {args.wheelhouse}...")
+    builder = WheelhouseBuilder(args.wheelhouse)
+    failures = 0
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {executor.submit(builder.add, requirement_set): requirement_set for requirement_set in requirement_sets}
+            for future in concurrent.futures.as_completed(futures):
+                requirement_set = futures[future]
+                print(f"{requirement_set.description}... ", end="")
+                try:
+                    future.result()
+                except subprocess.CalledProcessError as e:
+                    failures += 1
+                    print_error("failed")
+                    print(e.stderr)
+                else:
+                    print_success_msg()
+    finally:
+        builder.close()
+
+    if failures:
+        print_error(f"--- {failures} of {len(requirement_sets)} requirement sets could not be added to the wheelhouse ---")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
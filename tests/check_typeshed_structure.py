@@ -7,20 +7,34 @@ correct places, and that various configuration files are correct.
 
 from __future__ import annotations
 
+import functools
 import json
 import os
 import re
+import sys
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import NamedTuple
 
 from ts_utils.metadata import read_metadata
-from ts_utils.paths import PYRIGHT_CONFIG, REQUIREMENTS_PATH, STDLIB_PATH, STUBS_PATH, TEST_CASES_DIR, TESTS_DIR, tests_path
+from ts_utils.paths import (
+    PYRIGHT_CONFIG,
+    REQUIREMENTS_PATH,
+    STDLIB_PATH,
+    STUBS_PATH,
+    TEST_CASES_DIR,
+    TESTS_DIR,
+    TS_BASE_PATH,
+    tests_path,
+)
 from ts_utils.utils import (
     get_all_testcase_directories,
     get_gitignore_spec,
     jsonc_to_json,
     parse_requirements,
     parse_stdlib_versions_file,
-    spec_matches_path,
+    print_error,
 )
 
 extension_descriptions = {".pyi": "stub", ".py": ".py"}
@@ -34,28 +48,98 @@ ALLOWED_PY_FILES_IN_TESTS_DIR = {
 }
 
 
+class TreeEntry(NamedTuple):
+    path: Path
+    is_dir: bool
+    is_symlink: bool
+    ignored: bool
+
+
+class RepositoryTree:
+    """An index of all files and directories in the repository.
+
+    The repository is scanned once, up front, and all checks query the index
+    instead of walking the file system themselves. Directories ignored by
+    git (such as local virtual environments) are only scanned if a check
+    explicitly asks for ignored entries.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self._gitignore_spec = get_gitignore_spec()
+        self._children: dict[Path, list[TreeEntry]] = {}
+        pending = [root]
+        while pending:
+            directory = pending.pop()
+            pending.extend(entry.path for entry in self._scan(directory) if self._should_descend(entry))
+
+    def _scan(self, directory: Path) -> list[TreeEntry]:
+        children: list[TreeEntry] = []
+        with os.scandir(directory) as it:
+            dir_entries = sorted((dir_entry for dir_entry in it if dir_entry.name != ".git"), key=lambda e: e.name)
+        for dir_entry in dir_entries:
+            path = Path(dir_entry.path)
+            is_dir = dir_entry.is_dir()
+            ignored = self._gitignore_spec.match_file(path.as_posix() + ("/" if is_dir else ""))
+            children.append(TreeEntry(path, is_dir, dir_entry.is_symlink(), ignored))
+        self._children[directory] = children
+        return children
+
+    @staticmethod
+    def _should_descend(entry: TreeEntry) -> bool:
+        # Like os.walk(), don't descend into symlinked directories
+        return entry.is_dir and not entry.is_symlink and not entry.ignored
+
+    def iterdir(self, directory: Path, *, include_ignored: bool = False) -> list[TreeEntry]:
+        """Return the direct children of a directory."""
+        children = self._children.get(directory)
+        if children is None:
+            # Only ignored directories are not part of the initial scan
+            children = self._scan(directory) if include_ignored and directory.is_dir() else []
+        return [entry for entry in children if include_ignored or not entry.ignored]
+
+    def walk(self, directory: Path, *, include_ignored: bool = False) -> Iterator[TreeEntry]:
+        """Yield all files and directories below a directory, recursively."""
+        for entry in self.iterdir(directory, include_ignored=include_ignored):
+            yield entry
+            if entry.is_dir and not entry.is_symlink:
+                yield from self.walk(entry.path, include_ignored=include_ignored)
+
+    def files(self, directory: Path, *, suffix: str, include_ignored: bool = False) -> Iterator[Path]:
+        """Yield all files with the given suffix below a directory, recursively."""
+        return (
+            entry.path
+            for entry in self.walk(directory, include_ignored=include_ignored)
+            if not entry.is_dir and entry.path.suffix == suffix
+        )
+
+
+@functools.cache
+def get_repository_tree() -> RepositoryTree:
+    return RepositoryTree(TS_BASE_PATH)
+
+
 def assert_consistent_filetypes(
     directory: Path, *, kind: str, allowed: set[str], allow_nonidentifier_filenames: bool = False
 ) -> None:
     """Check that given directory contains only valid Python files of a certain kind."""
     allowed_paths = {Path(f) for f in allowed}
-    contents = list(directory.iterdir())
-    gitignore_spec = get_gitignore_spec()
+    tree = get_repository_tree()
+    contents = list(tree.iterdir(directory))
     while contents:
         entry = contents.pop()
-        if spec_matches_path(gitignore_spec, entry):
-            continue
-        if entry.relative_to(directory) in allowed_paths:
+        if entry.path.relative_to(directory) in allowed_paths:
             # Note if a subdirectory is allowed, we will not check its contents
             continue
-        if entry.is_file():
+        if not entry.is_dir:
             if not allow_nonidentifier_filenames:
-                assert entry.stem.isidentifier(), f'Files must be valid modules, got: "{entry}"'
-            bad_filetype = f'Only {extension_descriptions[kind]!r} files allowed in the "{directory}" directory; got: {entry}'
-            assert entry.suffix == kind, bad_filetype
+                assert entry.path.stem.isidentifier(), f'Files must be valid modules, got: "{entry.path}"'
+            bad_filetype = (
+                f'Only {extension_descriptions[kind]!r} files allowed in the "{directory}" directory; got: {entry.path}'
+            )
+            assert entry.path.suffix == kind, bad_filetype
         else:
-            assert entry.name.isidentifier(), f"Directories must be valid packages, got: {entry}"
-            contents.extend(entry.iterdir())
+            assert entry.path.name.isidentifier(), f"Directories must be valid packages, got: {entry.path}"
+            contents.extend(tree.iterdir(entry.path))
 
 
 def check_stdlib() -> None:
@@ -66,29 +150,36 @@ def check_stdlib() -> None:
 
 def check_stubs() -> None:
     """Check that the stubs directory contains only the correct files."""
-    gitignore_spec = get_gitignore_spec()
-    for dist in STUBS_PATH.iterdir():
-        if spec_matches_path(gitignore_spec, dist):
-            continue
-        assert dist.is_dir(), f"Only directories allowed in stubs, got {dist}"
+    errors: list[str] = []
+    for dist in get_repository_tree().iterdir(STUBS_PATH):
+        try:
+            check_distribution(dist)
+        except AssertionError as e:
+            errors.append(str(e))
+    assert not errors, "\n".join(errors)
 
-        valid_dist_name = "^([A-Z0-9]|[A-Z0-9][A-Z0-9._-]*[A-Z0-9])$"  # courtesy of PEP 426
-        assert re.fullmatch(
-            valid_dist_name, dist.name, re.IGNORECASE
-        ), f"Directory name must be a valid distribution name: {dist}"
-        assert not dist.name.startswith("types-"), f"Directory name not allowed to start with 'types-': {dist}"
 
-        allowed = {"METADATA.toml", "README", "README.md", "README.rst", TESTS_DIR}
-        assert_consistent_filetypes(dist, kind=".pyi", allowed=allowed)
+def check_distribution(entry: TreeEntry) -> None:
+    """Check that a single distribution's directory contains only the correct files."""
+    dist = entry.path
+    assert entry.is_dir, f"Only directories allowed in stubs, got {dist}"
 
-        tests_dir = tests_path(dist.name)
-        if tests_dir.exists() and tests_dir.is_dir():
-            check_tests_dir(tests_dir)
+    valid_dist_name = "^([A-Z0-9]|[A-Z0-9][A-Z0-9._-]*[A-Z0-9])$"  # courtesy of PEP 426
+    assert re.fullmatch(valid_dist_name, dist.name, re.IGNORECASE), f"Directory name must be a valid distribution name: {dist}"
+    assert not dist.name.startswith("types-"), f"Directory name not allowed to start with 'types-': {dist}"
+
+    allowed = {"METADATA.toml", "README", "README.md", "README.rst", TESTS_DIR}
+    assert_consistent_filetypes(dist, kind=".pyi", allowed=allowed)
+
+    tests_dir = tests_path(dist.name)
+    if any(child.path == tests_dir and child.is_dir for child in get_repository_tree().iterdir(dist)):
+        check_tests_dir(tests_dir)
 
 
 def check_tests_dir(tests_dir: Path) -> None:
     py_files_present = any(
-        file.suffix == ".py" and file.name not in ALLOWED_PY_FILES_IN_TESTS_DIR for file in tests_dir.iterdir()
+        entry.path.suffix == ".py" and entry.path.name not in ALLOWED_PY_FILES_IN_TESTS_DIR
+        for entry in get_repository_tree().iterdir(tests_dir)
     )
     error_message = f"Test-case files must be in an `{TESTS_DIR}/{TEST_CASES_DIR}` directory, not in the `{TESTS_DIR}` directory"
     assert not py_files_present, error_message
@@ -98,7 +189,7 @@ def check_distutils() -> None:
     """Check whether all setuptools._distutils files are re-exported from distutils."""
 
     def all_relative_paths_in_directory(path: Path) -> set[Path]:
-        return {pyi.relative_to(path) for pyi in path.rglob("*.pyi")}
+        return {pyi.relative_to(path) for pyi in get_repository_tree().files(path, suffix=".pyi", include_ignored=True)}
 
     setuptools_path = STUBS_PATH / "setuptools" / "setuptools" / "_distutils"
     distutils_path = STUBS_PATH / "setuptools" / "distutils"
@@ -115,17 +206,16 @@ def check_test_cases() -> None:
     for _, testcase_dir in get_all_testcase_directories():
         assert_consistent_filetypes(testcase_dir, kind=".py", allowed={"README.md"}, allow_nonidentifier_filenames=True)
         bad_test_case_filename = f'Files in a `{TEST_CASES_DIR}` directory must have names starting with "check_"; got "{{}}"'
-        for file in testcase_dir.rglob("*.py"):
+        for file in get_repository_tree().files(testcase_dir, suffix=".py", include_ignored=True):
             assert file.stem.startswith("check_"), bad_test_case_filename.format(file)
 
 
 def check_no_symlinks() -> None:
     """Check that there are no symlinks in the typeshed repository."""
-    files = [Path(root, file) for root, _, files in os.walk(".") for file in files]
     no_symlink = "You cannot use symlinks in typeshed, please copy {} to its link."
-    for file in files:
-        if file.suffix == ".pyi" and file.is_symlink():
-            raise ValueError(no_symlink.format(file))
+    for entry in get_repository_tree().walk(TS_BASE_PATH):
+        if not entry.is_dir and entry.path.suffix == ".pyi" and entry.is_symlink:
+            raise ValueError(no_symlink.format(entry.path))
 
 
 def check_versions_file() -> None:
@@ -146,22 +236,25 @@ def check_versions_file() -> None:
 
 def _find_stdlib_modules() -> set[str]:
     modules = set[str]()
-    for path, _, files in os.walk(STDLIB_PATH):
-        for filename in files:
-            base_module = ".".join(Path(path).parts[1:])
-            if filename == "__init__.pyi":
-                modules.add(base_module)
-            elif filename.endswith(".pyi"):
-                mod = filename[:-4]
-                modules.add(f"{base_module}.{mod}" if base_module else mod)
+    for path in get_repository_tree().files(STDLIB_PATH, suffix=".pyi", include_ignored=True):
+        base_module = ".".join(path.parent.relative_to(STDLIB_PATH).parts)
+        if path.name == "__init__.pyi":
+            modules.add(base_module)
+        else:
+            modules.add(f"{base_module}.{path.stem}" if base_module else path.stem)
     return modules
 
 
 def check_metadata() -> None:
     """Check that all METADATA.toml files are valid."""
-    for distribution in os.listdir(STUBS_PATH):
-        # This function does various sanity checks for METADATA.toml files
-        read_metadata(distribution)
+    errors: list[str] = []
+    for distribution in (entry.path.name for entry in get_repository_tree().iterdir(STUBS_PATH, include_ignored=True)):
+        try:
+            # This function does various sanity checks for METADATA.toml files
+            read_metadata(distribution)
+        except (AssertionError, ValueError) as e:
+            errors.append(f"{distribution}: {e}")
+    assert not errors, "\n".join(errors)
 
 
 def check_requirement_pins() -> None:
@@ -188,13 +281,35 @@ def check_pyright_exclude_order() -> None:
         ), f"Entry '{exclude[i]}' should come before '{exclude[i + 1]}' in the {PYRIGHT_CONFIG.name} exclude list"
 
 
+CHECKS: list[Callable[[], None]] = [
+    check_versions_file,
+    check_metadata,
+    check_requirement_pins,
+    check_no_symlinks,
+    check_stdlib,
+    check_stubs,
+    check_distutils,
+    check_test_cases,
+    check_pyright_exclude_order,
+]
+
+
+def main() -> int:
+    """Run all checks concurrently, and report every failure at once."""
+    # Scan the repository up front, so that the checks share a single index
+    get_repository_tree()
+    with ThreadPoolExecutor() as executor:
+        futures = [(check, executor.submit(check)) for check in CHECKS]
+
+    failed = False
+    for check, future in futures:
+        try:
+            future.result()
+        except (AssertionError, ValueError) as e:
+            failed = True
+            print_error(f"{check.__name__}: {check.__doc__}\n{e}\n")
+    return 1 if failed else 0
+
+
 if __name__ == "__main__":
-    check_versions_file()
-    check_metadata()
-    check_requirement_pins()
-    check_no_symlinks()
-    check_stdlib()
-    check_stubs()
-    check_distutils()
-    check_test_cases()
-    check_pyright_exclude_order()
+    sys.exit(main())
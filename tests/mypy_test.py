@@ -4,22 +4,34 @@
 from __future__ import annotations
 
 import argparse
+import ast
+import atexit
 import concurrent.futures
+import io
+import json
+import multiprocessing
 import os
+import re
+import shutil
 import subprocess
 import sys
 import tempfile
 import time
 from collections import defaultdict
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import redirect_stdout
 from dataclasses import dataclass
 from enum import Enum
+from functools import cache, partial
 from itertools import product
 from pathlib import Path
+from textwrap import dedent
 from threading import Lock
 from typing import Annotated, Any, NamedTuple, TypeAlias
 
 from packaging.requirements import Requirement
 
+from ts_utils.changes import stubs_affected_by_changes
 from ts_utils.metadata import PackageDependencies, get_recursive_requirements, read_metadata
 from ts_utils.mypy import MypyDistConf, mypy_configuration_from_distribution, temporary_mypy_config_file
 from ts_utils.paths import STDLIB_PATH, STUBS_PATH, TS_BASE_PATH, distribution_path
@@ -30,11 +42,15 @@ from ts_utils.utils import (
     colored,
     get_gitignore_spec,
     get_mypy_req,
+    positive_int,
     print_error,
     print_success_msg,
+    print_time,
     spec_matches_path,
     venv_python,
 )
+from ts_utils.venvs import cached_venv, cached_venv_path, prune_venv_cache, venv_cache_key
+from ts_utils.wheelhouse import use_wheelhouse, wheelhouse_directory
 
 # Fail early if mypy isn't installed
 try:
@@ -45,6 +61,7 @@ except ImportError:
 
 SUPPORTED_VERSIONS = ["3.15", "3.14", "3.13", "3.12", "3.11", "3.10"]
 SUPPORTED_PLATFORMS = ("linux", "win32", "darwin")
+SUPPORTED_BACKENDS = ("subprocess", "session")
 DIRECTORIES_TO_TEST = [STDLIB_PATH, STUBS_PATH]
 
 VersionString: TypeAlias = Annotated[str, "Must be one of the entries in SUPPORTED_VERSIONS"]
@@ -58,6 +75,13 @@ class CommandLineArgs:
     exclude: list[Path] | None
     python_version: list[VersionString] | None
     platform: list[Platform] | None
+    jobs: int
+    backend: str
+    stdlib_cache: bool
+    batch_size: int
+    changed_since: str | None
+    venv_cache: bool
+    wheelhouse: Path | None
 
 
 def valid_path(cmd_arg: str) -> Path:
@@ -90,6 +114,15 @@ parser.add_argument(
     help='Test these files and directories (defaults to all files in the "stdlib" and "stubs" directories)',
 )
 parser.add_argument("-x", "--exclude", type=valid_path, nargs="*", help="Exclude these files and directories")
+parser.add_argument(
+    "--changed-since",
+    metavar="REF",
+    help=(
+        "Only test the stubs affected by changes since the merge base with this git ref (e.g. origin/main), "
+        "including third-party stubs that depend on changed stubs. "
+        "Note that this cannot be specified together with paths to test."
+    ),
+)
 parser.add_argument("-v", "--verbose", action="count", default=0, help="More output")
 parser.add_argument(
     "-p",
@@ -107,6 +140,64 @@ parser.add_argument(
     action="extend",
     help="Run mypy for certain OS platforms (defaults to sys.platform only)",
 )
+parser.add_argument(
+    "-j",
+    "--jobs",
+    type=positive_int,
+    default=1,
+    help=(
+        "Run up to this many mypy invocations concurrently (defaults to 1). "
+        "With more than one job, every (version, platform, distribution) combination "
+        "is checked as an independent task, and the output of each task is printed in one piece."
+    ),
+)
+parser.add_argument(
+    "--backend",
+    choices=SUPPORTED_BACKENDS,
+    default="subprocess",
+    help=(
+        'How to invoke mypy (defaults to "subprocess"). '
+        '"session" keeps one warm mypy interpreter per Python version, platform and venv, '
+        "and reuses it for every distribution that has no [mypy-tests] configuration; "
+        "other distributions are still checked in a fresh subprocess."
+    ),
+)
+parser.add_argument(
+    "--stdlib-cache",
+    action="store_true",
+    help=(
+        "Build a mypy cache for the stdlib once per Python version and platform, "
+        "and give every third-party check a private copy-on-write view of it, "
+        "so that the stdlib is never re-analysed. Prints per-distribution timings."
+    ),
+)
+parser.add_argument(
+    "--venv-cache",
+    action="store_true",
+    help=(
+        "Reuse the virtual environments for stubs with non-types dependencies across runs. "
+        "They are kept in .typeshed_cache/venvs, and shared with regr_test.py."
+    ),
+)
+parser.add_argument(
+    "--wheelhouse",
+    metavar="DIR",
+    type=wheelhouse_directory,
+    help=(
+        "Install the dependencies of stubs from this directory only, without accessing the package index. "
+        "Build it with scripts/build_wheelhouse.py."
+    ),
+)
+parser.add_argument(
+    "--batch-size",
+    type=positive_int,
+    default=1,
+    help=(
+        "Check up to this many third-party distributions in a single mypy invocation (defaults to 1). "
+        "Only distributions that share a venv, have no [mypy-tests] configuration "
+        "and can't see each other's modules are combined; errors are still reported per distribution."
+    ),
+)
 
 
 @dataclass
@@ -118,6 +209,11 @@ class TestConfig:
     exclude: list[Path]
     version: VersionString
     platform: Platform
+    backend: str = "subprocess"
+    stdlib_cache_dir: Path | None = None  # Where the shared stdlib cache for this version and platform lives, if any
+    batch_size: int = 1
+    venv_cache: bool = False
+    tempdir: Path | None = None  # Removed at the end of the run; holds the caches of mypy sessions
 
 
 def log(args: TestConfig, *varargs: object) -> None:
@@ -162,7 +258,169 @@ class MypyResult(Enum):
             return MypyResult.CRASH
 
 
-def run_mypy(
+_MYPY_SESSION_SCRIPT = dedent("""
+    import json
+    import os
+    import sys
+
+    from mypy import api
+
+    # Keep a private handle on the original stdout for our responses,
+    # and send anything else that gets printed to stderr instead.
+    responses = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request["mypypath"] is None:
+            os.environ.pop("MYPYPATH", None)
+        else:
+            os.environ["MYPYPATH"] = request["mypypath"]
+        stdout, stderr, returncode = api.run(request["args"])
+        responses.write(json.dumps({"stdout": stdout, "stderr": stderr, "returncode": returncode}) + "\\n")
+        responses.flush()
+    """)
+
+
+class MypySession:
+    """A long-running interpreter that runs mypy in-process using `mypy.api`.
+
+    All invocations in a session share one incremental cache, so the stdlib
+    is only analysed by the first distribution checked in the session.
+
+    The cache is created in `cache_root`, if given. Sessions in worker processes
+    are never closed (the workers exit without running atexit handlers),
+    so `cache_root` should be a directory that is removed at the end of the run.
+    """
+
+    def __init__(self, python_path: str, stdlib_cache_dir: Path | None = None, *, cache_root: Path | None = None) -> None:
+        self._cache_dir = tempfile.TemporaryDirectory(prefix="mypy-session-", dir=cache_root)
+        if stdlib_cache_dir is not None and stdlib_cache_dir.exists():
+            overlay_stdlib_cache(stdlib_cache_dir, self.cache_dir)
+        self._process = subprocess.Popen(
+            [python_path, "-c", _MYPY_SESSION_SCRIPT], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+
+    @property
+    def cache_dir(self) -> Path:
+        return Path(self._cache_dir.name)
+
+    def run(self, mypy_args: list[str], mypypath: str | None) -> subprocess.CompletedProcess[str]:
+        assert self._process.stdin is not None
+        assert self._process.stdout is not None
+        self._process.stdin.write(json.dumps({"args": mypy_args, "mypypath": mypypath}) + "\n")
+        self._process.stdin.flush()
+        response = self._process.stdout.readline()
+        if not response:
+            raise RuntimeError(f"mypy session exited unexpectedly with exit code {self._process.wait()}")
+        data = json.loads(response)
+        return subprocess.CompletedProcess(mypy_args, data["returncode"], data["stdout"], data["stderr"])
+
+    def close(self) -> None:
+        assert self._process.stdin is not None
+        self._process.stdin.close()
+        self._process.wait()
+        self._cache_dir.cleanup()
+
+
+_MYPY_SESSIONS: dict[tuple[VersionString, Platform, Path | None], MypySession] = {}
+
+
+def get_mypy_session(args: TestConfig, venv_dir: Path | None) -> MypySession:
+    key = (args.version, args.platform, venv_dir)
+    if key not in _MYPY_SESSIONS:
+        python_path = sys.executable if venv_dir is None else str(venv_python(venv_dir))
+        _MYPY_SESSIONS[key] = MypySession(python_path, args.stdlib_cache_dir, cache_root=args.tempdir)
+    return _MYPY_SESSIONS[key]
+
+
+def discard_mypy_session(args: TestConfig, venv_dir: Path | None) -> None:
+    session = _MYPY_SESSIONS.pop((args.version, args.platform, venv_dir), None)
+    if session is not None:
+        session.close()
+
+
+@atexit.register
+def close_mypy_sessions() -> None:
+    while _MYPY_SESSIONS:
+        _, session = _MYPY_SESSIONS.popitem()
+        session.close()
+
+
+def mypy_flags(args: TestConfig, config_file: str, *, testing_stdlib: bool, non_types_dependencies: bool) -> list[str]:
+    flags = [
+        "--python-version",
+        args.version,
+        "--show-traceback",
+        "--warn-incomplete-stub",
+        "--no-error-summary",
+        "--platform",
+        args.platform,
+        "--custom-typeshed-dir",
+        str(TS_BASE_PATH),
+        "--strict",
+        # Stub completion is checked by pyright (--allow-*-defs)
+        "--allow-untyped-defs",
+        "--allow-incomplete-defs",
+        # See https://github.com/python/typeshed/pull/9491#issuecomment-1381574946
+        # for discussion and reasoning to keep "--allow-subclassing-any"
+        "--allow-subclassing-any",
+        "--enable-error-code",
+        "ignore-without-code",
+        "--enable-error-code",
+        "redundant-self",
+        "--config-file",
+        config_file,
+    ]
+    if not testing_stdlib:
+        flags.append("--explicit-package-bases")
+    if not non_types_dependencies:
+        flags.append("--no-site-packages")
+    if args.stdlib_cache_dir is not None:
+        # The shared cache relies on mypy's file-per-module cache layout, see overlay_stdlib_cache()
+        flags.append("--no-sqlite-cache")
+    return flags
+
+
+def build_stdlib_cache(args: TestConfig) -> None:
+    """Pre-build the shared stdlib cache for this version and platform, unless it already exists."""
+    assert args.stdlib_cache_dir is not None
+    if args.stdlib_cache_dir.exists():
+        return
+
+    files = [stub.path for stub in stdlib_stubs(args.version)]
+    print(f"Building stdlib cache for Python {args.version} on {args.platform} ({len(files)} files)... ", end="", flush=True)
+    start_time = time.perf_counter()
+    with temporary_mypy_config_file([]) as temp:
+        flags = mypy_flags(args, temp.name, testing_stdlib=True, non_types_dependencies=False)
+        mypy_command = [sys.executable, "-m", "mypy", *flags, "--cache-dir", str(args.stdlib_cache_dir), *map(str, files)]
+        if args.verbose:
+            print(colored(f"running {' '.join(mypy_command)}", "blue"))
+        result = subprocess.run(mypy_command, capture_output=True, text=True, check=False)
+    print_time(time.perf_counter() - start_time)
+    # Type errors in the stdlib are reported by test_stdlib(); the cache is usable regardless.
+    # After a crash, the cache may be incomplete, but mypy validates every cache entry before using it.
+    if result.returncode > 1:
+        print_error(f"mypy crashed (exit code {result.returncode}); continuing with a partial cache")
+        print_error(result.stderr)
+    else:
+        print_success_msg()
+
+
+def overlay_stdlib_cache(stdlib_cache_dir: Path, destination: Path) -> None:
+    """Populate `destination` with a copy-on-write view of the shared stdlib cache.
+
+    mypy never modifies cache files in place (it writes a temporary file and renames it over
+    the old one), so hard links to the shared cache files are safe to hand to any mypy run.
+    """
+    try:
+        shutil.copytree(stdlib_cache_dir, destination, copy_function=os.link, dirs_exist_ok=True)
+    except OSError:
+        # Hard links aren't supported everywhere; fall back to real copies
+        shutil.copytree(stdlib_cache_dir, destination, dirs_exist_ok=True)
+
+
+def invoke_mypy(
     args: TestConfig,
     configurations: list[MypyDistConf],
     files: list[Path],
@@ -171,62 +429,87 @@ def run_mypy(
     non_types_dependencies: bool,
     venv_dir: Path | None,
     mypypath: str | None = None,
-) -> MypyResult:
+) -> subprocess.CompletedProcess[str]:
     env_vars = dict(os.environ)
     if mypypath is not None:
         env_vars["MYPYPATH"] = mypypath
-    with temporary_mypy_config_file(configurations) as temp:
-        flags = [
-            "--python-version",
-            args.version,
-            "--show-traceback",
-            "--warn-incomplete-stub",
-            "--no-error-summary",
-            "--platform",
-            args.platform,
-            "--custom-typeshed-dir",
-            str(TS_BASE_PATH),
-            "--strict",
-            # Stub completion is checked by pyright (--allow-*-defs)
-            "--allow-untyped-defs",
-            "--allow-incomplete-defs",
-            # See https://github.com/python/typeshed/pull/9491#issuecomment-1381574946
-            # for discussion and reasoning to keep "--allow-subclassing-any"
-            "--allow-subclassing-any",
-            "--enable-error-code",
-            "ignore-without-code",
-            "--enable-error-code",
-            "redundant-self",
-            "--config-file",
-            temp.name,
-        ]
-        if not testing_stdlib:
-            flags.append("--explicit-package-bases")
-        if not non_types_dependencies:
-            flags.append("--no-site-packages")
-
-        mypy_args = [*flags, *map(str, files)]
-        python_path = sys.executable if venv_dir is None else str(venv_python(venv_dir))
-        mypy_command = [python_path, "-m", "mypy", *mypy_args]
-        if args.verbose:
-            print(colored(f"running {' '.join(mypy_command)}", "blue"))
-        result = subprocess.run(mypy_command, capture_output=True, text=True, env=env_vars, check=False)
+    with temporary_mypy_config_file(configurations) as temp, tempfile.TemporaryDirectory(prefix="mypy-cache-") as cache_dir:
+        flags = mypy_flags(args, temp.name, testing_stdlib=testing_stdlib, non_types_dependencies=non_types_dependencies)
+
+        # Distributions with custom [mypy-tests] configuration can't share a session,
+        # since the session's cache was built with the default configuration.
+        if args.backend == "session" and not configurations:
+            session = get_mypy_session(args, venv_dir)
+            mypy_args = [*flags, "--cache-dir", str(session.cache_dir), *map(str, files)]
+            if args.verbose:
+                print(colored(f"running mypy session with {' '.join(mypy_args)}", "blue"))
+            result = session.run(mypy_args, mypypath)
+            if result.returncode > 1:
+                # Don't reuse the interpreter after a crash
+                discard_mypy_session(args, venv_dir)
+        else:
+            if args.stdlib_cache_dir is not None and args.stdlib_cache_dir.exists():
+                overlay_stdlib_cache(args.stdlib_cache_dir, Path(cache_dir))
+                flags.extend(["--cache-dir", cache_dir])
+            mypy_args = [*flags, *map(str, files)]
+            python_path = sys.executable if venv_dir is None else str(venv_python(venv_dir))
+            mypy_command = [python_path, "-m", "mypy", *mypy_args]
+            if args.verbose:
+                print(colored(f"running {' '.join(mypy_command)}", "blue"))
+            result = subprocess.run(mypy_command, capture_output=True, text=True, env=env_vars, check=False)
+    return result
+
+
+def report_mypy_result(
+    args: TestConfig, result: subprocess.CompletedProcess[str], *, venv_dir: Path | None, elapsed: float
+) -> MypyResult:
+    if args.stdlib_cache_dir is not None:
+        print_time(elapsed)
     if result.returncode:
         print_error(f"failure (exit code {result.returncode})\n")
         if result.stdout:
             print_error(result.stdout)
         if result.stderr:
             print_error(result.stderr)
-        if non_types_dependencies and args.verbose:
+        if venv_dir is not None and args.verbose:
             print("Ran with the following environment:")
-            subprocess.run(["uv", "pip", "freeze"], env={**os.environ, "VIRTUAL_ENV": str(venv_dir)}, check=False)
-            print()
+            freeze = subprocess.run(
+                ["uv", "pip", "freeze"],
+                env={**os.environ, "VIRTUAL_ENV": str(venv_dir)},
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            print(freeze.stdout)
     else:
         print_success_msg()
 
     return MypyResult.from_process_result(result)
 
 
+def run_mypy(
+    args: TestConfig,
+    configurations: list[MypyDistConf],
+    files: list[Path],
+    *,
+    testing_stdlib: bool,
+    non_types_dependencies: bool,
+    venv_dir: Path | None,
+    mypypath: str | None = None,
+) -> MypyResult:
+    start_time = time.perf_counter()
+    result = invoke_mypy(
+        args,
+        configurations,
+        files,
+        testing_stdlib=testing_stdlib,
+        non_types_dependencies=non_types_dependencies,
+        venv_dir=venv_dir,
+        mypypath=mypypath,
+    )
+    return report_mypy_result(args, result, venv_dir=venv_dir, elapsed=time.perf_counter() - start_time)
+
+
 def distribution_stub_files(distribution: str, args: TestConfig, seen_dists: set[str]) -> list[Path]:
     typeshed_reqs = get_recursive_requirements(distribution).typeshed_pkgs
     if distribution in seen_dists:
@@ -278,6 +561,164 @@ def test_third_party_distribution(
     return TestResult(result, len(files))
 
 
+# ====================================================================
+# Batching of compatible distributions
+# ====================================================================
+
+_ERROR_PATH_RE = re.compile(r"^stubs[/\\]([^/\\]+)[/\\]")
+
+
+@cache
+def visible_distributions(distribution: str) -> frozenset[str]:
+    """Return the distributions whose stubs are on MYPYPATH when checking `distribution`."""
+    return frozenset({distribution, *(r.name for r in get_recursive_requirements(distribution).typeshed_pkgs)})
+
+
+@cache
+def top_level_modules(distribution: str) -> frozenset[str]:
+    """Return the names of the top-level modules and packages provided by a distribution."""
+    return frozenset(stub.module_parts[0] for stub in third_party_stubs(distribution))
+
+
+@cache
+def imported_top_level_modules(distribution: str) -> frozenset[str] | None:
+    """Return the top-level names of all absolute imports in a distribution's stubs.
+
+    Return None if the stubs can't be parsed by the running Python version.
+    """
+    imported: set[str] = set()
+    for stub in third_party_stubs(distribution):
+        try:
+            tree = ast.parse(stub.path.read_text(encoding="UTF-8"))
+        except SyntaxError:
+            return None
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                imported.update(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                imported.add(node.module.split(".")[0])
+    return frozenset(imported)
+
+
+def can_share_invocation(distributions: Sequence[str]) -> bool:
+    """Return whether these distributions can be checked by one mypy invocation with the same outcome.
+
+    Checking them together puts the stubs of all of them (and their typeshed dependencies)
+    on MYPYPATH. That's only safe if no module is provided by two different distributions,
+    and if no distribution (or one of its dependencies) imports a module that it
+    wouldn't be able to see when checked on its own.
+    """
+    visible = {distribution: visible_distributions(distribution) for distribution in distributions}
+    all_visible = frozenset().union(*visible.values())
+
+    provided_modules: set[str] = set()
+    for distribution in all_visible:
+        modules = top_level_modules(distribution)
+        if not provided_modules.isdisjoint(modules):
+            return False
+        provided_modules |= modules
+
+    for own_visible in visible.values():
+        extra_modules = frozenset().union(*(top_level_modules(extra) for extra in all_visible - own_visible))
+        for dependency in own_visible:
+            imports = imported_top_level_modules(dependency)
+            if imports is None or not imports.isdisjoint(extra_modules):
+                return False
+    return True
+
+
+def plan_batches(distributions: Iterable[str], batch_size: int) -> list[tuple[str, ...]]:
+    """Group distributions into batches that can each be checked by a single mypy invocation.
+
+    Distributions are only grouped if they use the same venv and none of them
+    has a [mypy-tests] configuration. Batches are filled first-fit, in order.
+    """
+    batches: list[list[str]] = []
+    open_batches: defaultdict[Path | None, list[list[str]]] = defaultdict(list)
+    for distribution in distributions:
+        if batch_size == 1 or mypy_configuration_from_distribution(distribution):
+            batches.append([distribution])
+            continue
+        candidates = open_batches[_DISTRIBUTION_TO_VENV_MAPPING[distribution]]
+        for batch in candidates:
+            if len(batch) < batch_size and can_share_invocation([*batch, distribution]):
+                batch.append(distribution)
+                break
+        else:
+            new_batch = [distribution]
+            batches.append(new_batch)
+            candidates.append(new_batch)
+    return [tuple(batch) for batch in batches]
+
+
+def attribute_mypy_output(output: str, distributions: Sequence[str]) -> dict[str, list[str]]:
+    """Split the output of a batched mypy invocation by distribution.
+
+    Lines about a file in a third-party distribution are attributed to every batched
+    distribution that sees that file when checked on its own, i.e. to that distribution
+    and to the distributions that depend on it. All other lines are attributed to every distribution.
+    """
+    lines_by_distribution: dict[str, list[str]] = {distribution: [] for distribution in distributions}
+    for line in output.splitlines():
+        match = _ERROR_PATH_RE.match(line)
+        owner = match.group(1) if match else None
+        for distribution, lines in lines_by_distribution.items():
+            if owner is None or owner in visible_distributions(distribution):
+                lines.append(line)
+    return lines_by_distribution
+
+
+def test_third_party_batch(distributions: Sequence[str], args: TestConfig, venv_dir: Path | None) -> list[TestResult]:
+    """Test the stubs of several compatible third-party distributions with a single mypy invocation.
+
+    Results are reported per distribution, as if each had been checked on its own.
+    """
+    results: list[TestResult] = []
+    files_by_distribution: dict[str, list[Path]] = {}
+    seen_dists: set[str] = set()
+    for distribution in distributions:
+        distribution_seen_dists: set[str] = set()
+        files = distribution_stub_files(distribution, args, distribution_seen_dists)
+        if not files and args.filter:
+            results.append(TestResult(MypyResult.SUCCESS, 0))
+            continue
+        if not files:
+            print(f"testing {distribution} (0 files)... ", end="", flush=True)
+            print_error("no files found")
+            sys.exit(1)
+        files_by_distribution[distribution] = files
+        seen_dists |= distribution_seen_dists
+
+    if not files_by_distribution:
+        return results
+
+    mypypath = os.pathsep.join(str(distribution_path(dist)) for dist in sorted(seen_dists))
+    if args.verbose:
+        print(colored(f"Checking {', '.join(files_by_distribution)} together with MYPYPATH={mypypath}", "blue"))
+    start_time = time.perf_counter()
+    result = invoke_mypy(
+        args,
+        [],
+        [file for files in files_by_distribution.values() for file in files],
+        venv_dir=venv_dir,
+        mypypath=mypypath,
+        testing_stdlib=False,
+        non_types_dependencies=venv_dir is not None,
+    )
+    elapsed_per_distribution = (time.perf_counter() - start_time) / len(files_by_distribution)
+
+    stdout_by_distribution = attribute_mypy_output(result.stdout, list(files_by_distribution))
+    for distribution, files in files_by_distribution.items():
+        print(f"testing {distribution} ({len(files)} files)... ", end="", flush=True)
+        stdout = "".join(f"{line}\n" for line in stdout_by_distribution[distribution])
+        # After a crash, every distribution in the batch is considered to have crashed
+        returncode = result.returncode if result.returncode > 1 or stdout or result.stderr else 0
+        distribution_result = subprocess.CompletedProcess(result.args, returncode, stdout, result.stderr)
+        mypy_result = report_mypy_result(args, distribution_result, venv_dir=venv_dir, elapsed=elapsed_per_distribution)
+        results.append(TestResult(mypy_result, len(files)))
+    return results
+
+
 def test_stdlib(args: TestConfig) -> TestResult:
     files = [stub.path for stub in stdlib_stubs(args.version) if match(stub, args)]
 
@@ -317,41 +758,84 @@ class TestSummary:
 
 _PRINT_LOCK = Lock()
 _DISTRIBUTION_TO_VENV_MAPPING: dict[str, Path | None] = {}
+# Venvs are set up in the background; checks that need a venv must wait for it to be ready.
+# Each future's result is the output of setting up the venv, printed by wait_for_venv().
+_VENV_SETUP_FUTURES: dict[Path, concurrent.futures.Future[str]] = {}
+_REPORTED_VENV_SETUPS: set[Path] = set()
+
+
+@cache
+def venv_setup_executor() -> concurrent.futures.ThreadPoolExecutor:
+    # Limit workers to 10 at a time, since setting up venvs makes network requests
+    return concurrent.futures.ThreadPoolExecutor(max_workers=10, thread_name_prefix="venv-setup")
+
 
+# The venvs are set up in background threads, so their output is captured rather than printed,
+# and printed by wait_for_venv() instead, so that it doesn't interleave with the test output.
+# If a command fails, the CalledProcessError's `output` attribute holds everything printed so far.
 
-def setup_venv_for_external_requirements_set(
-    requirements_set: frozenset[Requirement], tempdir: Path, args: TestConfig
-) -> tuple[frozenset[Requirement], Path]:
-    venv_dir = tempdir / f".venv-{hash(requirements_set)}"
+
+def run_venv_setup_command(command: list[str], output: list[str], env: dict[str, str] | None = None) -> None:
+    """Run a command to set up a venv, appending everything it prints to `output`."""
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env, check=False)
+    output.append(result.stdout)
+    if result.returncode:
+        raise subprocess.CalledProcessError(result.returncode, command, "".join(output))
+
+
+def create_venv(venv_dir: Path, args: TestConfig, output: list[str], *, python: str | None = None) -> None:
     uv_command = ["uv", "venv", str(venv_dir)]
+    if python is not None:
+        uv_command += ["--python", python]
     if not args.verbose:
         uv_command.append("--quiet")
-    subprocess.run(uv_command, check=True)
-    return requirements_set, venv_dir
+    run_venv_setup_command(uv_command, output)
+
 
+def setup_venv(venv_dir: Path, args: TestConfig, requirements_set: frozenset[Requirement]) -> str:
+    output: list[str] = []
+    start_time = time.perf_counter()
+    create_venv(venv_dir, args, output)
+    install_requirements_for_venv(venv_dir, args, requirements_set, output)
+    if args.verbose:
+        output.append(colored(f"Set up venv {venv_dir} in {time.perf_counter() - start_time:.2f} seconds", "blue") + "\n")
+    return "".join(output)
 
-def install_requirements_for_venv(venv_dir: Path, args: TestConfig, external_requirements: frozenset[Requirement]) -> None:
+
+def setup_cached_venv(key: str, args: TestConfig, requirements_set: frozenset[Requirement]) -> str:
+    output: list[str] = []
+
+    def build(venv_dir: Path) -> None:
+        # The cache key records the running interpreter, so make sure that's the one the venv uses
+        create_venv(venv_dir, args, output, python=sys.executable)
+        install_requirements_for_venv(venv_dir, args, requirements_set, output)
+
+    cached_venv(key, build)
+    return "".join(output)
+
+
+def install_requirements_for_venv(
+    venv_dir: Path, args: TestConfig, external_requirements: frozenset[Requirement], output: list[str]
+) -> None:
     req_args = sorted(str(req) for req in external_requirements)
     # Use --no-cache-dir to avoid issues with concurrent read/writes to the cache
     uv_command = ["uv", "pip", "install", get_mypy_req(), *req_args, "--no-cache-dir"]
     if args.verbose:
-        with _PRINT_LOCK:
-            print(colored(f"Running {uv_command}", "blue"))
+        output.append(colored(f"Running {uv_command}", "blue") + "\n")
     else:
         uv_command.append("--quiet")
-    try:
-        subprocess.run(uv_command, check=True, text=True, env={**os.environ, "VIRTUAL_ENV": str(venv_dir)})
-    except subprocess.CalledProcessError as e:
-        print(e.stderr)
-        raise
+    run_venv_setup_command(uv_command, output, env={**os.environ, "VIRTUAL_ENV": str(venv_dir)})
 
 
 def setup_virtual_environments(distributions: dict[str, PackageDependencies], args: TestConfig, tempdir: Path) -> None:
-    """Logic necessary for testing stubs with non-types dependencies in isolated environments."""
+    """Logic necessary for testing stubs with non-types dependencies in isolated environments.
+
+    The venvs are set up in the background, so that checks that don't need them can start
+    right away; call wait_for_venv() before using one.
+    """
     if not distributions:
         return  # hooray! Nothing to do
 
-    # STAGE 1: Determine which (if any) stubs packages require virtual environments.
     # Group stubs packages according to their external-requirements sets
     external_requirements_to_distributions: defaultdict[frozenset[Requirement], list[str]] = defaultdict(list)
     num_pkgs_with_external_reqs = 0
@@ -370,62 +854,71 @@ def setup_virtual_environments(distributions: dict[str, PackageDependencies], ar
             print(colored("No additional venvs are required to be set up", "blue"))
         return
 
-    # STAGE 2: Setup a virtual environment for each unique set of external requirements
-    requirements_sets_to_venvs: dict[frozenset[Requirement], Path] = {}
-
     if args.verbose:
         num_venvs = len(external_requirements_to_distributions)
         msg = (
             f"Setting up {num_venvs} venv{'s' if num_venvs != 1 else ''} "
             f"for {num_pkgs_with_external_reqs} "
-            f"distribution{'s' if num_pkgs_with_external_reqs != 1 else ''}... "
+            f"distribution{'s' if num_pkgs_with_external_reqs != 1 else ''} in the background"
+            f"{' (using the venv cache)' if args.venv_cache else ''}"
         )
-        print(colored(msg, "blue"), end="", flush=True)
-
-    venv_start_time = time.perf_counter()
-
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        venv_futures = [
-            executor.submit(setup_venv_for_external_requirements_set, requirements_set, tempdir, args)
-            for requirements_set in external_requirements_to_distributions
-        ]
-        for venv_future in concurrent.futures.as_completed(venv_futures):
-            requirements_set, venv_dir = venv_future.result()
-            requirements_sets_to_venvs[requirements_set] = venv_dir
-
-    venv_elapsed_time = time.perf_counter() - venv_start_time
-
-    if args.verbose:
-        print(colored(f"took {venv_elapsed_time:.2f} seconds", "blue"))
+        print(colored(msg, "blue"))
 
-    # STAGE 3: For each {virtual_environment: requirements_set} pairing,
-    # `uv pip install` the requirements set into the virtual environment
-    pip_start_time = time.perf_counter()
+    # Set up a virtual environment for each unique set of external requirements.
+    # The location of each venv is known up front, even though it isn't ready yet.
+    for requirements_set, distribution_list in external_requirements_to_distributions.items():
+        if args.venv_cache:
+            key = venv_cache_key("mypy", (str(req) for req in requirements_set))
+            venv_dir = cached_venv_path(key)
+            setup = partial(setup_cached_venv, key, args, requirements_set)
+        else:
+            venv_dir = tempdir / f".venv-{hash(requirements_set)}"
+            setup = partial(setup_venv, venv_dir, args, requirements_set)
+        if venv_dir not in _VENV_SETUP_FUTURES:
+            _VENV_SETUP_FUTURES[venv_dir] = venv_setup_executor().submit(setup)
+        _DISTRIBUTION_TO_VENV_MAPPING.update(dict.fromkeys(distribution_list, venv_dir))
 
-    # Limit workers to 10 at a time, since this makes network requests
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        pip_install_futures = [
-            executor.submit(install_requirements_for_venv, venv_dir, args, requirements_set)
-            for requirements_set, venv_dir in requirements_sets_to_venvs.items()
-        ]
-        concurrent.futures.wait(pip_install_futures)
 
-    pip_elapsed_time = time.perf_counter() - pip_start_time
+def wait_for_venv(venv_dir: Path | None) -> None:
+    """Block until the venv at `venv_dir` (if any) has been set up, re-raising any setup errors.
 
-    if args.verbose:
-        msg = f"Combined time for installing requirements across all venvs: {pip_elapsed_time:.2f} seconds"
-        print(colored(msg, "blue"))
+    The output of setting up the venv is printed the first time this is called for it.
+    """
+    if venv_dir is None:
+        return
+    try:
+        output = _VENV_SETUP_FUTURES[venv_dir].result()
+    except subprocess.CalledProcessError as e:
+        if venv_dir not in _REPORTED_VENV_SETUPS:
+            _REPORTED_VENV_SETUPS.add(venv_dir)
+            with _PRINT_LOCK:
+                print_error(f"Failed to set up venv {venv_dir}:\n{e.output}")
+        raise
+    if venv_dir not in _REPORTED_VENV_SETUPS:
+        _REPORTED_VENV_SETUPS.add(venv_dir)
+        if output:
+            with _PRINT_LOCK:
+                print(output, end="", flush=True)
+
+
+def in_venv_readiness_order(batches: Iterable[tuple[str, ...]]) -> Iterator[tuple[str, ...]]:
+    """Yield batches that don't need a venv first, and the others as soon as their venv is ready."""
+    waiting: defaultdict[concurrent.futures.Future[str], list[tuple[str, ...]]] = defaultdict(list)
+    for batch in batches:
+        venv_dir = _DISTRIBUTION_TO_VENV_MAPPING[batch[0]]
+        if venv_dir is None:
+            yield batch
+        else:
+            waiting[_VENV_SETUP_FUTURES[venv_dir]].append(batch)
+    for future in concurrent.futures.as_completed(waiting):
+        yield from waiting[future]
 
-    # STAGE 4: Populate the _DISTRIBUTION_TO_VENV_MAPPING
-    # so that we have a simple {distribution: venv_to_use} mapping to use for the rest of the test.
-    for requirements_set, distribution_list in external_requirements_to_distributions.items():
-        venv_to_use = requirements_sets_to_venvs[requirements_set]
-        _DISTRIBUTION_TO_VENV_MAPPING.update(dict.fromkeys(distribution_list, venv_to_use))
 
+def select_third_party_distributions(args: TestConfig, summary: TestSummary) -> dict[str, PackageDependencies]:
+    """Determine which third-party distributions should be checked in this run.
 
-def test_third_party_stubs(args: TestConfig, tempdir: Path) -> TestSummary:
-    print("Testing third-party packages...")
-    summary = TestSummary()
+    Distributions that are skipped for this Python version are recorded in `summary`.
+    """
     gitignore_spec = get_gitignore_spec()
     distributions_to_check: dict[str, PackageDependencies] = {}
 
@@ -463,43 +956,82 @@ def test_third_party_stubs(args: TestConfig, tempdir: Path) -> TestSummary:
 
             distributions_to_check[distribution] = requirements
 
-    # Setup the necessary virtual environments for testing the third-party stubs.
+    return distributions_to_check
+
+
+def prepare_virtual_environments(distributions: dict[str, PackageDependencies], args: TestConfig, tempdir: Path) -> None:
+    """Make sure that there is an entry in _DISTRIBUTION_TO_VENV_MAPPING for every distribution."""
     # Note that some stubs may not be tested on all Python versions
     # (due to version incompatibilities),
     # so we can't guarantee that setup_virtual_environments()
     # will only be called once per session.
     distributions_without_venv = {
         distribution: requirements
-        for distribution, requirements in distributions_to_check.items()
+        for distribution, requirements in distributions.items()
         if distribution not in _DISTRIBUTION_TO_VENV_MAPPING
     }
     setup_virtual_environments(distributions_without_venv, args, tempdir)
 
     # Check that there is a venv for every distribution we're testing.
     # Some venvs may exist from previous runs but are skipped in this run.
-    assert _DISTRIBUTION_TO_VENV_MAPPING.keys() >= distributions_to_check.keys()
+    assert _DISTRIBUTION_TO_VENV_MAPPING.keys() >= distributions.keys()
+
+
+def test_third_party_stubs(args: TestConfig, tempdir: Path) -> TestSummary:
+    print("Testing third-party packages...")
+    summary = TestSummary()
+    distributions_to_check = select_third_party_distributions(args, summary)
 
-    for distribution in distributions_to_check:
-        venv_dir = _DISTRIBUTION_TO_VENV_MAPPING[distribution]
+    # Setup the necessary virtual environments for testing the third-party stubs.
+    prepare_virtual_environments(distributions_to_check, args, tempdir)
+
+    if args.stdlib_cache_dir is not None and distributions_to_check:
+        build_stdlib_cache(args)
+
+    start_time = time.perf_counter()
+    for batch in in_venv_readiness_order(plan_batches(distributions_to_check, args.batch_size)):
+        venv_dir = _DISTRIBUTION_TO_VENV_MAPPING[batch[0]]
+        wait_for_venv(venv_dir)
+        if len(batch) > 1:
+            for mypy_result, files_checked in test_third_party_batch(batch, args, venv_dir):
+                summary.register_result(mypy_result, files_checked)
+            continue
         non_types_dependencies = venv_dir is not None
         mypy_result, files_checked = test_third_party_distribution(
-            distribution, args, venv_dir=venv_dir, non_types_dependencies=non_types_dependencies
+            batch[0], args, venv_dir=venv_dir, non_types_dependencies=non_types_dependencies
         )
         summary.register_result(mypy_result, files_checked)
 
+    if args.stdlib_cache_dir is not None and distributions_to_check:
+        elapsed = time.perf_counter() - start_time
+        num_distributions = len(distributions_to_check)
+        msg = (
+            f"Checked {num_distributions} distribution{'' if num_distributions == 1 else 's'} in {elapsed:.2f} seconds "
+            f"({elapsed / num_distributions:.2f} seconds per distribution)"
+        )
+        print(colored(msg, "blue"))
+
     return summary
 
 
+def wants_stdlib(args: TestConfig) -> bool:
+    return STDLIB_PATH in args.filter or any(STDLIB_PATH in path.parents for path in args.filter)
+
+
+def wants_third_party(args: TestConfig) -> bool:
+    return STUBS_PATH in args.filter or any(STUBS_PATH in path.parents for path in args.filter)
+
+
 def test_typeshed(args: TestConfig, tempdir: Path) -> TestSummary:
     print(f"*** Testing Python {args.version} on {args.platform}")
     summary = TestSummary()
 
-    if STDLIB_PATH in args.filter or any(STDLIB_PATH in path.parents for path in args.filter):
+    if wants_stdlib(args):
         mypy_result, files_checked = test_stdlib(args)
         summary.register_result(mypy_result, files_checked)
         print()
 
-    if STUBS_PATH in args.filter or any(STUBS_PATH in path.parents for path in args.filter):
+    if wants_third_party(args):
         tp_results = test_third_party_stubs(args, tempdir)
         summary.merge(tp_results)
         print()
@@ -507,19 +1039,141 @@ def test_typeshed(args: TestConfig, tempdir: Path) -> TestSummary:
     return summary
 
 
+class MypyTask(NamedTuple):
+    """A single mypy invocation that can be run independently of all others."""
+
+    args: TestConfig
+    distributions: tuple[str, ...] | None  # None means the stdlib
+    venv_dir: Path | None
+
+
+def run_task(task: MypyTask) -> tuple[list[TestResult], str]:
+    """Run a single mypy task, returning its result and everything it printed.
+
+    This is executed in a worker process, so redirecting stdout does not affect other tasks.
+    """
+    output = io.StringIO()
+    with redirect_stdout(output):
+        if task.distributions is None:
+            results = [test_stdlib(task.args)]
+        elif len(task.distributions) > 1:
+            results = test_third_party_batch(task.distributions, task.args, task.venv_dir)
+        else:
+            results = [
+                test_third_party_distribution(
+                    task.distributions[0], task.args, venv_dir=task.venv_dir, non_types_dependencies=task.venv_dir is not None
+                )
+            ]
+    # Prefix every line, so that it's clear which version and platform each line is about
+    prefix = f"[{task.args.version}/{task.args.platform}] "
+    return results, "".join(prefix + line if line.strip() else line for line in output.getvalue().splitlines(keepends=True))
+
+
+def test_typeshed_concurrently(configs: list[TestConfig], tempdir: Path, jobs: int) -> TestSummary:
+    """Check all version/platform combinations using a pool of worker processes.
+
+    Every mypy invocation is scheduled as an independent task. Tasks that don't need
+    a venv start right away; the others start as soon as their venv is ready.
+    """
+    summary = TestSummary()
+    tasks: list[MypyTask] = []
+    for args in configs:
+        if wants_stdlib(args):
+            tasks.append(MypyTask(args, None, None))
+        if wants_third_party(args):
+            distributions = select_third_party_distributions(args, summary)
+            prepare_virtual_environments(distributions, args, tempdir)
+            if args.stdlib_cache_dir is not None and distributions:
+                build_stdlib_cache(args)
+            tasks.extend(
+                MypyTask(args, batch, _DISTRIBUTION_TO_VENV_MAPPING[batch[0]])
+                for batch in plan_batches(distributions, args.batch_size)
+            )
+
+    print(f"Running {len(tasks)} mypy task{'' if len(tasks) == 1 else 's'} using {jobs} workers...")
+    # The venvs are still being set up by threads in this process, which makes forking it unsafe
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    mp_context = multiprocessing.get_context(start_method)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context) as executor:
+        running: set[concurrent.futures.Future[tuple[list[TestResult], str]]] = set()
+        waiting: defaultdict[concurrent.futures.Future[str], list[MypyTask]] = defaultdict(list)
+        for task in tasks:
+            if task.venv_dir is None:
+                running.add(executor.submit(run_task, task))
+            else:
+                waiting[_VENV_SETUP_FUTURES[task.venv_dir]].append(task)
+
+        while running or waiting:
+            pending: list[concurrent.futures.Future[Any]] = [*running, *waiting]
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for venv_future in waiting.keys() & done:
+                ready_tasks = waiting.pop(venv_future)
+                wait_for_venv(ready_tasks[0].venv_dir)  # Print its output, and re-raise any errors
+                running.update(executor.submit(run_task, task) for task in ready_tasks)
+            for future in running & done:
+                running.remove(future)
+                results, output = future.result()
+                print(output, end="", flush=True)
+                for mypy_result, files_checked in results:
+                    summary.register_result(mypy_result, files_checked)
+    print()
+
+    return summary
+
+
 def main() -> None:
     args = parser.parse_args(namespace=CommandLineArgs())
+    if args.wheelhouse is not None:
+        use_wheelhouse(args.wheelhouse)
     versions = args.python_version or SUPPORTED_VERSIONS
     platforms = args.platform or [sys.platform]
-    path_filter = args.filter or DIRECTORIES_TO_TEST
+    if args.changed_since is not None:
+        if args.filter:
+            parser.error("Cannot specify both --changed-since and paths to test")
+        try:
+            affected = stubs_affected_by_changes(args.changed_since)
+        except ValueError as e:
+            parser.error(str(e))
+        path_filter = [STDLIB_PATH] if affected.stdlib else []
+        if affected.all_distributions:
+            path_filter.append(STUBS_PATH)
+        else:
+            path_filter.extend(distribution_path(distribution) for distribution in sorted(affected.distributions))
+        if not path_filter:
+            print(colored(f"--- no stubs affected by changes since {args.changed_since!r}; nothing to do ---", "green"))
+            return
+    else:
+        path_filter = args.filter or DIRECTORIES_TO_TEST
     exclude = args.exclude or []
     summary = TestSummary()
     with tempfile.TemporaryDirectory() as td:
         td_path = Path(td)
-        for version, platform in product(versions, platforms):
-            config = TestConfig(args.verbose, path_filter, exclude, version, platform)
-            version_summary = test_typeshed(args=config, tempdir=td_path)
-            summary.merge(version_summary)
+        configs = [
+            TestConfig(
+                args.verbose,
+                path_filter,
+                exclude,
+                version,
+                platform,
+                args.backend,
+                td_path / "stdlib-cache" / f"{version}-{platform}" if args.stdlib_cache else None,
+                args.batch_size,
+                args.venv_cache,
+                td_path,
+            )
+            for version, platform in product(versions, platforms)
+        ]
+        if args.jobs > 1:
+            summary.merge(test_typeshed_concurrently(configs, td_path, args.jobs))
+        else:
+            for config in configs:
+                version_summary = test_typeshed(args=config, tempdir=td_path)
+                summary.merge(version_summary)
+        # Stop the sessions before their caches are removed along with the temporary directory
+        close_mypy_sessions()
+
+    if args.venv_cache:
+        prune_venv_cache()
 
     if summary.mypy_result == MypyResult.FAILURE:
         plural1 = "" if summary.packages_with_errors == 1 else "s"
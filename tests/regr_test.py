@@ -13,8 +13,10 @@ import subprocess
 import sys
 import tempfile
 import threading
+import time
 from abc import ABCMeta, abstractmethod
-from collections.abc import Callable, Generator
+from collections import defaultdict
+from collections.abc import Callable, Generator, Mapping
 from contextlib import ExitStack, contextmanager, suppress
 from dataclasses import dataclass
 from enum import IntEnum
@@ -23,10 +25,16 @@ from pathlib import Path
 from typing import TypeAlias
 from typing_extensions import override
 
+from packaging.requirements import Requirement
+
+from ts_utils.changes import get_changed_paths, stubs_affected_by_changes, testcases_affected_by_changes
+from ts_utils.fingerprints import directory_fingerprint, distribution_fingerprint, fingerprint
+from ts_utils.ledger import Ledger, balanced_shards, expected_durations
 from ts_utils.metadata import get_recursive_requirements, read_metadata
 from ts_utils.mypy import mypy_configuration_from_distribution, temporary_mypy_config_file
-from ts_utils.paths import STDLIB_PATH, TEST_CASES_DIR, TS_BASE_PATH, distribution_path
+from ts_utils.paths import REGR_TEST_LEDGER_PATH, STDLIB_PATH, TEST_CASES_DIR, TS_BASE_PATH, distribution_path
 from ts_utils.py315 import PY315_INCOMPATIBLE_RUNTIME_DEPENDENCIES
+from ts_utils.result_cache import ResultCache
 from ts_utils.utils import (
     PYTHON_VERSION,
     DistributionTests,
@@ -38,6 +46,8 @@ from ts_utils.utils import (
     print_skipped,
     venv_python,
 )
+from ts_utils.venvs import cached_venv, cached_venv_path, prune_venv_cache, venv_cache_key
+from ts_utils.wheelhouse import use_wheelhouse, wheelhouse_directory
 
 ReturnCode: TypeAlias = int
 
@@ -46,6 +56,7 @@ TYPESHED = "typeshed"
 
 SUPPORTED_PLATFORMS = ["linux", "darwin", "win32"]
 SUPPORTED_VERSIONS = ["3.15", "3.14", "3.13", "3.12", "3.11", "3.10"]
+SUPPORTED_TYPESHED_LAYOUTS = ["link", "copy"]
 
 
 def distribution_with_test_cases(distribution_name: str) -> DistributionTests:
@@ -81,6 +92,14 @@ parser.add_argument(
         "Note that this cannot be specified if --platform and/or --python-version are specified."
     ),
 )
+parser.add_argument(
+    "--changed-since",
+    metavar="REF",
+    help=(
+        "Only run the test cases of stubs affected by changes since the merge base with this git ref (e.g. origin/main). "
+        "Note that this cannot be specified if packages to test are specified."
+    ),
+)
 parser.add_argument(
     "--verbosity",
     choices=[member.name for member in Verbosity],
@@ -110,6 +129,42 @@ parser.add_argument(
         "Note that this cannot be specified if --all is also specified."
     ),
 )
+parser.add_argument(
+    "--venv-cache",
+    action="store_true",
+    help=(
+        "Reuse the virtual environments for packages with non-types dependencies across runs. "
+        "They are kept in .typeshed_cache/venvs, and shared with mypy_test.py."
+    ),
+)
+parser.add_argument(
+    "--result-cache",
+    action="store_true",
+    help=(
+        "Don't run the test cases again for combinations of package, Python version and platform that passed before, "
+        "unless the test cases, the stubs they use or the mypy version changed. "
+        "Results are kept in .typeshed_cache/results/regr_test."
+    ),
+)
+parser.add_argument(
+    "--wheelhouse",
+    metavar="DIR",
+    type=wheelhouse_directory,
+    help=(
+        "Install the dependencies of packages from this directory only, without accessing the package index. "
+        "Build it with scripts/build_wheelhouse.py."
+    ),
+)
+parser.add_argument(
+    "--typeshed-layout",
+    choices=SUPPORTED_TYPESHED_LAYOUTS,
+    default="link",
+    help=(
+        "How to build the isolated typeshed directory for third-party test cases. "
+        '"link" (the default) links to the stubs in this checkout instead of copying them; '
+        '"copy" copies the stdlib and all required stubs for every package'
+    ),
+)
 
 _PRINT_QUEUE: queue.SimpleQueue[str] = queue.SimpleQueue()
 
@@ -118,7 +173,24 @@ def verbose_log(msg: str) -> None:
     _PRINT_QUEUE.put(colored(msg, "blue"))
 
 
-def setup_testcase_dir(package: DistributionTests, tempdir: Path, verbosity: Verbosity) -> None:
+def link_tree(source: Path, destination: Path) -> None:
+    """Make the read-only directory tree at `source` available at `destination`, without copying it.
+
+    A symlink is used where possible. Where symlinks can't be created (e.g. on Windows
+    without the required privileges), the tree is rebuilt out of hard links instead,
+    falling back to real copies only if hard links aren't supported either.
+    """
+    try:
+        destination.symlink_to(source.resolve(), target_is_directory=True)
+    except OSError:
+        try:
+            shutil.copytree(source, destination, copy_function=os.link)
+        except OSError:
+            shutil.rmtree(destination, ignore_errors=True)
+            shutil.copytree(source, destination)
+
+
+def setup_testcase_dir(package: DistributionTests, tempdir: Path, verbosity: Verbosity, layout: str = "link") -> None:
     if verbosity is verbosity.VERBOSE:
         verbose_log(f"{package.name}: Setting up testcase dir in {tempdir}")
     # --warn-unused-ignores doesn't work for files inside typeshed.
@@ -136,41 +208,148 @@ def setup_testcase_dir(package: DistributionTests, tempdir: Path, verbosity: Ver
     # The best way of doing that without stopping --warn-unused-ignore from working
     # seems to be to create a "new typeshed" directory in a tempdir
     # that has only the required stubs copied over.
+    #
+    # Only the test cases need to live outside typeshed for --warn-unused-ignores to work;
+    # the stubs themselves are never modified, so by default they are linked rather than copied.
+    copy_tree = link_tree if layout == "link" else shutil.copytree
     new_typeshed = tempdir / TYPESHED
-    new_typeshed.mkdir()
-    shutil.copytree(STDLIB_PATH, new_typeshed / "stdlib")
+    (new_typeshed / "stubs").mkdir(parents=True)
+    copy_tree(STDLIB_PATH, new_typeshed / "stdlib")
     requirements = get_recursive_requirements(package.name)
     # mypy refuses to consider a directory a "valid typeshed directory"
     # unless there's a stubs/mypy-extensions path inside it,
     # so add that to the list of stubs to copy over to the new directory
     typeshed_requirements = [r.name for r in requirements.typeshed_pkgs]
     for requirement in {package.name, *typeshed_requirements, "mypy-extensions"}:
-        shutil.copytree(distribution_path(requirement), new_typeshed / "stubs" / requirement)
-
-    if requirements.external_pkgs:
-        venv_location = str(tempdir / VENV_DIR)
-        subprocess.run(["uv", "venv", venv_location], check=True, capture_output=True)
-        ext_requirements = [str(r) for r in requirements.external_pkgs]
-        uv_command = ["uv", "pip", "install", get_mypy_req(), *ext_requirements]
-        if sys.platform == "win32":
-            # Reads/writes to the cache are threadsafe with uv generally...
-            # but not on old Windows versions
-            # https://github.com/astral-sh/uv/issues/2810
-            uv_command.append("--no-cache-dir")
+        copy_tree(distribution_path(requirement), new_typeshed / "stubs" / requirement)
+
+
+def overlay_tree(source: Path, destination: Path) -> None:
+    """Give a single test run a private, writable view of the directory tree at `source`.
+
+    Files are hard-linked where possible. This is safe for mypy caches, since mypy never
+    modifies a cache file in place: it writes a new file and renames it over the old one,
+    so the file in `source` stays untouched.
+    """
+    try:
+        shutil.copytree(source, destination, copy_function=os.link)
+    except OSError:
+        shutil.rmtree(destination, ignore_errors=True)
+        shutil.copytree(source, destination)
+
+
+def mypy_flags(version: str, platform: str, config_file: str) -> list[str]:
+    # "--enable-error-code ignore-without-code" is purposefully omitted.
+    # See https://github.com/python/typeshed/pull/8083
+    return [
+        "--python-version",
+        version,
+        "--show-traceback",
+        "--no-error-summary",
+        "--platform",
+        platform,
+        "--strict",
+        "--pretty",
+        "--config-file",
+        config_file,
+        # The overlays of the shared stdlib cache rely on the file-based cache (see overlay_tree())
+        "--no-sqlite-cache",
+        # Not useful for the test cases
+        "--disable-error-code=empty-body",
+    ]
+
+
+def build_stdlib_cache(cache_dir: Path, version: str, platform: str, verbosity: Verbosity) -> None:
+    """Build a mypy cache for builtins and all stdlib modules it depends on, which every test run needs.
+
+    The cache is shared by all test runs for this version and platform, but never written to:
+    each test run works on a private overlay of it instead. Otherwise, concurrent runs would race
+    (https://github.com/python/mypy/issues/13916).
+    """
+    with temporary_mypy_config_file([]) as temp_config:
+        mypy_command = [
+            sys.executable,
+            "-m",
+            "mypy",
+            *mypy_flags(version, platform, temp_config.name),
+            "--cache-dir",
+            str(cache_dir),
+            "--custom-typeshed-dir",
+            str(TS_BASE_PATH),
+            "--no-site-packages",
+            "-c",
+            "",
+        ]
         if verbosity is Verbosity.VERBOSE:
-            verbose_log(f"{package.name}: Setting up venv in {venv_location}. {uv_command=}\n")
-        try:
-            subprocess.run(
-                uv_command, check=True, capture_output=True, text=True, env=os.environ | {"VIRTUAL_ENV": venv_location}
-            )
-        except subprocess.CalledProcessError as e:
-            _PRINT_QUEUE.put(f"{package.name}\n{e.stderr}")
-            raise
+            verbose_log(f"Building the stdlib cache for {version}/{platform} in {cache_dir}. {mypy_command=}\n")
+        result = subprocess.run(mypy_command, capture_output=True, check=False)
+        if result.returncode > 1:
+            # mypy crashed or hit a blocking error, e.g. a syntax error in the stdlib stubs. Throw away
+            # whatever was written: the test runs then use a private cache, and report the error themselves.
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def setup_venv(
+    external_requirements: frozenset[Requirement],
+    venv_dir: Path,
+    packages: list[str],
+    verbosity: Verbosity,
+    python: str | None = None,
+) -> None:
+    """Create a venv with mypy and a set of external requirements, to be shared by all `packages`."""
+    venv_location = str(venv_dir)
+    uv_venv_command = ["uv", "venv", venv_location]
+    if python is not None:
+        uv_venv_command += ["--python", python]
+    subprocess.run(uv_venv_command, check=True, capture_output=True)
+    ext_requirements = sorted(str(r) for r in external_requirements)
+    uv_command = ["uv", "pip", "install", get_mypy_req(), *ext_requirements]
+    if sys.platform == "win32":
+        # Reads/writes to the cache are threadsafe with uv generally...
+        # but not on old Windows versions
+        # https://github.com/astral-sh/uv/issues/2810
+        uv_command.append("--no-cache-dir")
+    if verbosity is Verbosity.VERBOSE:
+        verbose_log(f"{', '.join(packages)}: Setting up venv in {venv_location}. {uv_command=}\n")
+    try:
+        subprocess.run(uv_command, check=True, capture_output=True, text=True, env=os.environ | {"VIRTUAL_ENV": venv_location})
+    except subprocess.CalledProcessError as e:
+        _PRINT_QUEUE.put(f"{', '.join(packages)}\n{e.stderr}")
+        raise
+
+
+def testcase_fingerprint(package: DistributionTests, version: str, platform: str) -> str:
+    """Return a fingerprint of everything the result of running a package's test cases depends on."""
+    stdlib_fingerprint = directory_fingerprint(STDLIB_PATH)  # Includes the stdlib test cases
+    if package.is_stdlib:
+        return fingerprint(stdlib_fingerprint, get_mypy_req(), *mypy_flags(version, platform, ""))
+    external_requirements = sorted(str(r) for r in get_recursive_requirements(package.name).external_pkgs)
+    return fingerprint(
+        # Includes the package's test cases, and the stubs of all its typeshed dependencies
+        distribution_fingerprint(package.name),
+        distribution_fingerprint("mypy-extensions"),
+        stdlib_fingerprint,
+        *external_requirements,
+        get_mypy_req(),
+        *mypy_flags(version, platform, ""),
+    )
 
 
 def run_testcases(
-    package: DistributionTests, version: str, platform: str, *, tempdir: Path, verbosity: Verbosity
+    package: DistributionTests,
+    version: str,
+    platform: str,
+    *,
+    tempdir: Path,
+    venv_dir: Path | None = None,
+    stdlib_cache: Path | None = None,
+    testcase_files: frozenset[Path] | None = None,
+    verbosity: Verbosity,
 ) -> subprocess.CompletedProcess[str] | None:
+    """Run mypy on a package's test cases.
+
+    If `testcase_files` is given, only these test case files (relative to the test case directory) are checked.
+    """
     env_vars = dict(os.environ)
     new_test_case_dir = tempdir / TEST_CASES_DIR
 
@@ -180,27 +359,16 @@ def run_testcases(
         configurations = mypy_configuration_from_distribution(package.name)
 
     with temporary_mypy_config_file(configurations) as temp_config:
-        # "--enable-error-code ignore-without-code" is purposefully omitted.
-        # See https://github.com/python/typeshed/pull/8083
-        flags = [
-            "--python-version",
-            version,
-            "--show-traceback",
-            "--no-error-summary",
-            "--platform",
-            platform,
-            "--strict",
-            "--pretty",
-            "--config-file",
-            temp_config.name,
+        flags = mypy_flags(version, platform, temp_config.name)
+        cache_dir = tempdir / ".mypy_cache" / version / platform
+        # The shared stdlib cache doesn't exist if building it failed
+        if stdlib_cache is not None and stdlib_cache.exists():
+            overlay_tree(stdlib_cache, cache_dir)
+        else:
             # Avoid race conditions when using the cache
             # https://github.com/python/mypy/issues/13916
-            "--no-incremental",
-            "--cache-dir",
-            str(tempdir / ".mypy_cache" / version / platform),
-            # Not useful for the test cases
-            "--disable-error-code=empty-body",
-        ]
+            flags.append("--no-incremental")
+        flags.extend(["--cache-dir", str(cache_dir)])
 
         if package.is_stdlib:
             python_exe = sys.executable
@@ -209,9 +377,8 @@ def run_testcases(
         else:
             custom_typeshed = tempdir / TYPESHED
             env_vars["MYPYPATH"] = os.pathsep.join(map(str, custom_typeshed.glob("stubs/*")))
-            has_non_types_dependencies = (tempdir / VENV_DIR).exists()
-            if has_non_types_dependencies:
-                python_exe = str(venv_python(tempdir / VENV_DIR))
+            if venv_dir is not None:
+                python_exe = str(venv_python(venv_dir))
             else:
                 python_exe = sys.executable
                 flags.append("--no-site-packages")
@@ -222,6 +389,8 @@ def run_testcases(
         # only run the test if --python-version was set to 3.14 or higher (for example)
         files: list[str] = []
         for path in new_test_case_dir.rglob("*.py"):
+            if testcase_files is not None and path.relative_to(new_test_case_dir) not in testcase_files:
+                continue
             if match := re.fullmatch(r".*-py3(\d\d)", path.stem):
                 minor_version_required = int(match[1])
                 assert f"3.{minor_version_required}" in SUPPORTED_VERSIONS
@@ -275,6 +444,20 @@ class RunResult(Result):
                 print_error(self.stdout, fix_path=replacements)
 
 
+@dataclass(frozen=True)
+class CachedResult(Result):
+    package: str
+    version: str
+    platform: str
+
+    @override
+    def print_description(self, verbosity: Verbosity) -> None:
+        if verbosity is Verbosity.VERBOSE:
+            print_skipped(
+                f"Test cases for {self.package!r} on Python {self.version} for platform {self.platform!r} passed before."
+            )
+
+
 @dataclass(frozen=True)
 class NoTestsResult(Result):
     package: str
@@ -288,14 +471,31 @@ class NoTestsResult(Result):
 
 
 def test_testcase_directory(
-    package: DistributionTests, version: str, platform: str, *, verbosity: Verbosity, tempdir: Path
+    package: DistributionTests,
+    version: str,
+    platform: str,
+    *,
+    verbosity: Verbosity,
+    tempdir: Path,
+    venv_dir: Path | None = None,
+    stdlib_cache: Path | None = None,
+    testcase_files: frozenset[Path] | None = None,
 ) -> Result:
     msg = f"mypy --platform {platform} --python-version {version} on the "
     msg += "standard library test cases" if package.is_stdlib else f"test cases for {package.name!r}"
     if verbosity > Verbosity.QUIET:
         _PRINT_QUEUE.put(f"Running {msg}...")
 
-    proc_info = run_testcases(package=package, version=version, platform=platform, tempdir=tempdir, verbosity=verbosity)
+    proc_info = run_testcases(
+        package=package,
+        version=version,
+        platform=platform,
+        tempdir=tempdir,
+        venv_dir=venv_dir,
+        stdlib_cache=stdlib_cache,
+        testcase_files=testcase_files,
+        verbosity=verbosity,
+    )
     if proc_info is None:
         return NoTestsResult(0, package.name, version, platform)
 
@@ -309,6 +509,18 @@ def test_testcase_directory(
     )
 
 
+def run_timed(ledger: Ledger, name: str, task_fingerprint: str | None, task: Callable[[], Result]) -> Result:
+    """Run a task, and record its result and duration in the ledger.
+
+    Nothing is recorded for tasks without a fingerprint, which only check some of the test cases.
+    """
+    start_time = time.perf_counter()
+    result = task()
+    if task_fingerprint is not None:
+        ledger.record(name, success=result.code == 0, duration=time.perf_counter() - start_time, fingerprint=task_fingerprint)
+    return result
+
+
 def print_queued_messages(ev: threading.Event) -> None:
     while not ev.is_set():
         with suppress(queue.Empty):
@@ -328,14 +540,45 @@ def concurrently_run_testcases(
     verbosity: Verbosity,
     platforms_to_test: list[str],
     versions_to_test: list[str],
+    typeshed_layout: str = "link",
+    *,
+    venv_cache: bool = False,
+    result_cache: ResultCache | None = None,
+    testcase_selection: Mapping[DistributionTests, frozenset[Path]] | None = None,
 ) -> list[Result]:
+    """Run the test cases of all packages for all versions and platforms.
+
+    `testcase_selection` limits some packages to a subset of their test case files.
+    """
+    if testcase_selection is None:
+        testcase_selection = {}
     packageinfo_to_tempdir = {
         distribution_info: Path(stack.enter_context(tempfile.TemporaryDirectory())) for distribution_info in testcase_directories
     }
-    to_do: list[Callable[[], Result]] = []
+    # Packages with the same set of external requirements share a single venv,
+    # across all Python versions and platforms
+    venvs_dir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+    external_requirements_to_venv: dict[frozenset[Requirement], Path] = {}
+    venv_setup_tasks: dict[Path, Callable[[], object]] = {}
+    venv_to_packages: defaultdict[Path, list[str]] = defaultdict(list)
+    # A read-only mypy cache of the stdlib for each version and platform, shared by all packages
+    stdlib_caches_dir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+    stdlib_caches = {
+        (version, platform): stdlib_caches_dir / version / platform
+        for version in versions_to_test
+        for platform in platforms_to_test
+    }
+    # Keyed by "package/version/platform"
+    to_do: dict[str, Callable[[], Result]] = {}
+    # None for tasks that only check some of the test cases, whose results aren't recorded
+    task_fingerprints: dict[str, str | None] = {}
+    cached_results: list[Result] = []
+    # The setup steps each task depends on: its test case directory, its venv (if any), and the stdlib cache it uses
+    task_dependencies: dict[str, tuple[DistributionTests, Path | None, tuple[str, str]]] = {}
     for testcase_dir, tempdir in packageinfo_to_tempdir.items():
         pkg = testcase_dir.name
         requires_python = None
+        venv_dir: Path | None = None
         if not testcase_dir.is_stdlib:
             if PYTHON_VERSION == "3.15" and pkg in PY315_INCOMPATIBLE_RUNTIME_DEPENDENCIES:
                 msg = f"skipping {pkg!r} test cases (runtime dependencies do not support 3.15 yet)"
@@ -346,20 +589,67 @@ def concurrently_run_testcases(
                 msg = f"skipping {pkg!r} (requires Python {requires_python}; test is being run using Python {PYTHON_VERSION})"
                 print(colored(msg, "yellow"))
                 continue
+
+        versions_and_platforms: list[tuple[str, str]] = []
         for version in versions_to_test:
-            if not testcase_dir.is_stdlib:
-                assert requires_python is not None
-                if not requires_python.contains(version):
-                    msg = f"skipping {pkg!r} for target Python {version} (requires Python {requires_python})"
-                    print(colored(msg, "yellow"))
+            if requires_python is not None and not requires_python.contains(version):
+                msg = f"skipping {pkg!r} for target Python {version} (requires Python {requires_python})"
+                print(colored(msg, "yellow"))
+                continue
+            for platform in platforms_to_test:
+                task_fingerprint = testcase_fingerprint(testcase_dir, version, platform)
+                if result_cache is not None and result_cache.passed(task_fingerprint):
+                    cached_results.append(CachedResult(0, pkg, version, platform))
                     continue
-            to_do.extend(
-                partial(test_testcase_directory, testcase_dir, version, platform, verbosity=verbosity, tempdir=tempdir)
-                for platform in platforms_to_test
+                task_fingerprints[f"{pkg}/{version}/{platform}"] = (
+                    None if testcase_dir in testcase_selection else task_fingerprint
+                )
+                versions_and_platforms.append((version, platform))
+        if not versions_and_platforms:
+            continue
+
+        if not testcase_dir.is_stdlib:
+            external_requirements = frozenset(get_recursive_requirements(pkg).external_pkgs)
+            if external_requirements:
+                venv_dir = external_requirements_to_venv.get(external_requirements)
+                if venv_dir is None:
+                    if venv_cache:
+                        venv_key = venv_cache_key("mypy", (str(r) for r in external_requirements))
+                        venv_dir = cached_venv_path(venv_key)
+                        # The cache key records the running interpreter, so make sure that's the one the venv uses
+                        build = partial(
+                            setup_venv,
+                            external_requirements,
+                            packages=venv_to_packages[venv_dir],
+                            verbosity=verbosity,
+                            python=sys.executable,
+                        )
+                        venv_setup_tasks[venv_dir] = partial(cached_venv, venv_key, build)
+                    else:
+                        venv_dir = venvs_dir / f"{VENV_DIR}-{len(external_requirements_to_venv)}"
+                        venv_setup_tasks[venv_dir] = partial(
+                            setup_venv, external_requirements, venv_dir, venv_to_packages[venv_dir], verbosity
+                        )
+                    external_requirements_to_venv[external_requirements] = venv_dir
+                venv_to_packages[venv_dir].append(pkg)
+        for version, platform in versions_and_platforms:
+            to_do[f"{pkg}/{version}/{platform}"] = partial(
+                test_testcase_directory,
+                testcase_dir,
+                version,
+                platform,
+                verbosity=verbosity,
+                tempdir=tempdir,
+                venv_dir=venv_dir,
+                stdlib_cache=stdlib_caches[version, platform],
+                testcase_files=testcase_selection.get(testcase_dir),
             )
+            task_dependencies[f"{pkg}/{version}/{platform}"] = (testcase_dir, venv_dir, (version, platform))
 
+    if cached_results and verbosity > Verbosity.QUIET:
+        print(colored(f"Skipping {len(cached_results)} test run(s) that passed before (--result-cache)", "green"))
     if not to_do:
-        return []
+        return cached_results
 
     @contextmanager
     def cleanup_threads(
@@ -374,37 +664,133 @@ def concurrently_run_testcases(
             executor.shutdown(cancel_futures=True)
             raise
 
+    # Start the longest tasks first, so that a slow package doesn't end up as the long tail of the run.
+    # Tasks that never ran before are assumed to take as long as an average task.
+    ledger = Ledger(REGR_TEST_LEDGER_PATH)
+    durations = ledger.durations()
+    schedule = expected_durations(list(to_do), durations)
+    max_workers = os.cpu_count() or 1
+    predicted_time = max(shard.expected_duration for shard in balanced_shards(list(to_do), durations, max_workers))
+
     event = threading.Event()
     printer_thread = threading.Thread(target=print_queued_messages, args=(event,))
     printer_thread.start()
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-        # Each temporary directory may be used by multiple processes concurrently during the next step;
-        # must make sure that they're all setup correctly before starting the next step,
-        # in order to avoid race conditions
-        testcase_futures = [
-            executor.submit(setup_testcase_dir, package, tempdir, verbosity)
+    start_time = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        packages_to_test = {package for package, _, _ in task_dependencies.values()}
+        versions_and_platforms_to_test = {version_and_platform for _, _, version_and_platform in task_dependencies.values()}
+        testcase_dir_futures: dict[DistributionTests, concurrent.futures.Future[object]] = {
+            package: executor.submit(setup_testcase_dir, package, tempdir, verbosity, typeshed_layout)
             for package, tempdir in packageinfo_to_tempdir.items()
-        ]
-
-        with cleanup_threads(event, printer_thread, executor):
-            for future in concurrent.futures.as_completed(testcase_futures):
-                future.result()
-
-        mypy_futures = [executor.submit(task) for task in to_do]
-
+            if package in packages_to_test
+        }
+        venv_futures: dict[Path, concurrent.futures.Future[object]] = {
+            venv_dir: executor.submit(setup_task) for venv_dir, setup_task in venv_setup_tasks.items()
+        }
+        stdlib_cache_futures: dict[tuple[str, str], concurrent.futures.Future[object]] = {
+            version_and_platform: executor.submit(build_stdlib_cache, cache_dir, *version_and_platform, verbosity)
+            for version_and_platform, cache_dir in stdlib_caches.items()
+            if version_and_platform in versions_and_platforms_to_test
+        }
+        if verbosity is Verbosity.VERBOSE:
+            num_packages = sum(map(len, venv_to_packages.values()))
+            verbose_log(f"Setting up {len(venv_setup_tasks)} venv(s) for {num_packages} package(s)")
+
+        def setup_futures(name: str) -> list[concurrent.futures.Future[object]]:
+            package, venv_dir, version_and_platform = task_dependencies[name]
+            futures = [testcase_dir_futures[package], stdlib_cache_futures[version_and_platform]]
+            if venv_dir is not None:
+                futures.append(venv_futures[venv_dir])
+            return futures
+
+        # The prediction doesn't include the setup, so it's compared to the time from the start of the first mypy task
+        task_start_times: list[float] = []
+
+        def run_task(name: str) -> Result:
+            task_start_times.append(time.perf_counter())
+            return run_timed(ledger, name, task_fingerprints[name], to_do[name])
+
+        # Each temporary directory may be used by multiple processes concurrently;
+        # must make sure that it's set up completely before starting any task that uses it,
+        # in order to avoid race conditions. Tasks are started as soon as their own
+        # setup is done, rather than waiting for the setup of all packages.
+        mypy_futures: dict[str, concurrent.futures.Future[Result]] = {}
+        waiting = list(schedule)
         with cleanup_threads(event, printer_thread, executor):
-            results = [future.result() for future in mypy_futures]
+            while waiting:
+                still_waiting: list[str] = []
+                for name in waiting:
+                    dependencies = setup_futures(name)
+                    if all(future.done() for future in dependencies):
+                        for future in dependencies:
+                            future.result()  # Raise any exception that happened during setup
+                        mypy_futures[name] = executor.submit(run_task, name)
+                    else:
+                        still_waiting.append(name)
+                waiting = still_waiting
+                if waiting:
+                    pending = {future for name in waiting for future in setup_futures(name) if not future.done()}
+                    concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            results = [mypy_futures[name].result() for name in to_do]
+        end_time = time.perf_counter()
+        elapsed_time = end_time - start_time
+        mypy_time = end_time - min(task_start_times, default=end_time)
+
+    if result_cache is not None:
+        for name, result in zip(to_do, results, strict=True):
+            passed_fingerprint = task_fingerprints[name]
+            if result.code == 0 and passed_fingerprint is not None:
+                result_cache.record_pass(passed_fingerprint)
 
     event.set()
     printer_thread.join()
-    return results
+    if verbosity > Verbosity.QUIET:
+        print(
+            f"Ran {len(to_do)} mypy task(s) in {mypy_time:.1f} s from the start of the first one "
+            f"(predicted: {predicted_time:.1f} s), {elapsed_time:.1f} s including setup"
+        )
+    return [*cached_results, *results]
 
 
 def main() -> ReturnCode:
     args = parser.parse_args()
+    if args.wheelhouse is not None:
+        use_wheelhouse(args.wheelhouse)
 
-    testcase_directories = args.packages_to_test or get_all_testcase_directories()
+    testcase_selection: dict[DistributionTests, frozenset[Path]] = {}
+    if args.changed_since is not None:
+        if args.packages_to_test:
+            parser.error("Cannot specify both --changed-since and packages to test")
+        try:
+            affected = stubs_affected_by_changes(args.changed_since)
+        except ValueError as e:
+            parser.error(str(e))
+        # Within the affected packages, only run the test cases that import a changed stub
+        changed_paths = get_changed_paths(args.changed_since)
+        testcase_directories = []
+        for testcase_dir in get_all_testcase_directories():
+            if not (affected.stdlib if testcase_dir.is_stdlib else testcase_dir.name in affected.distributions):
+                continue
+            test_cases = testcases_affected_by_changes(testcase_dir, changed_paths)
+            if test_cases is not None:
+                if not test_cases:
+                    continue
+                testcase_selection[testcase_dir] = frozenset(
+                    path.relative_to(testcase_dir.test_cases_path) for path in test_cases
+                )
+                num_test_cases = len(list(testcase_dir.test_cases_path.rglob("*.py")))
+                msg = (
+                    f"{testcase_dir.name}: running {len(test_cases)} of {num_test_cases} test case files, affected by the changes"
+                )
+                print(colored(msg, "blue"))
+            testcase_directories.append(testcase_dir)
+        if not testcase_directories:
+            print(colored(f"No test cases are affected by changes since {args.changed_since!r}", "green"))
+            return 0
+    else:
+        testcase_directories = args.packages_to_test or get_all_testcase_directories()
     verbosity = Verbosity[args.verbosity]
     if args.all:
         if args.platforms_to_test:
@@ -419,7 +805,22 @@ def main() -> ReturnCode:
     results: list[Result] | None = None
 
     with ExitStack() as stack:
-        results = concurrently_run_testcases(stack, testcase_directories, verbosity, platforms_to_test, versions_to_test)
+        results = concurrently_run_testcases(
+            stack,
+            testcase_directories,
+            verbosity,
+            platforms_to_test,
+            versions_to_test,
+            args.typeshed_layout,
+            venv_cache=args.venv_cache,
+            result_cache=ResultCache("regr_test") if args.result_cache else None,
+            testcase_selection=testcase_selection,
+        )
+
+    if args.venv_cache:
+        prune_venv_cache()
+    if args.result_cache:
+        ResultCache("regr_test").prune()
 
     assert results is not None
     if not results:
@@ -4,36 +4,176 @@
 from __future__ import annotations
 
 import argparse
+import concurrent.futures
+import io
+import json
+import multiprocessing
 import os
 import re
 import subprocess
 import sys
 import tempfile
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext, redirect_stdout
+from functools import partial
 from pathlib import Path
 from shutil import rmtree
 from textwrap import dedent
 from time import time
+from typing import Any, Final, NamedTuple
 from typing_extensions import Never
 
+from ts_utils.changes import stubs_affected_by_changes
+from ts_utils.fingerprints import directory_fingerprint, distribution_fingerprint, fingerprint
+from ts_utils.ledger import Ledger, balanced_shards, read_durations
 from ts_utils.metadata import NoSuchStubError, get_recursive_requirements, read_metadata
 from ts_utils.mypy import mypy_configuration_from_distribution, temporary_mypy_config_file
-from ts_utils.paths import STUBS_PATH, allowlists_path, tests_path
+from ts_utils.paths import STDLIB_PATH, STUBS_PATH, STUBTEST_LEDGER_PATH, allowlists_path, tests_path
+from ts_utils.requirements import get_stubtest_install_requirements
+from ts_utils.result_cache import ResultCache
 from ts_utils.utils import (
     PYTHON_VERSION,
     allowlist_stubtest_arguments,
     colored,
     get_mypy_req,
+    positive_int,
     print_divider,
     print_error,
     print_info,
     print_success_msg,
     print_time,
     print_warning,
+    venv_python,
 )
+from ts_utils.venvs import cached_venv, prune_venv_cache, venv_cache_key
+from ts_utils.wheelhouse import use_wheelhouse, wheelhouse_directory
 
+# These run stubtest inside a uWSGI server or gdb (see below). They are never run
+# concurrently with other distributions, so that they have the machine to themselves.
+EXCLUSIVE_DISTRIBUTIONS: Final = frozenset({"gdb", "uWSGI"})
 
-def run_stubtest(dist: Path, *, verbose: bool = False, ci_platforms_only: bool = False, keep_tmp_dir: bool = False) -> bool:
-    """Run stubtest for a single distribution."""
+# Phases of a stubtest run that are timed separately. "mypy_build" and "runtime_check" are
+# parts of "stubtest", and are only known if stubtest ran through the worker script.
+PHASES: Final = ("venv", "install", "result_cache", "stubtest", "mypy_build", "runtime_check", "generate_allowlist")
+
+
+class JobSlots:
+    """Limits on the number of concurrent venv setups and stubtest runs.
+
+    When running with --jobs, worker processes replace these with semaphores shared between all workers.
+    """
+
+    install: AbstractContextManager[Any] = nullcontext()
+    stubtest: AbstractContextManager[Any] = nullcontext()
+
+
+class VenvSetupError(Exception):
+    def __init__(self, message: str, error: subprocess.CalledProcessError) -> None:
+        super().__init__(message)
+        self.message = message
+        self.error = error
+
+
+@contextmanager
+def timed(phases: dict[str, float], phase: str) -> Iterator[None]:
+    """Add the time spent in the body of the with statement to `phases[phase]`."""
+    start_time = time()
+    try:
+        yield
+    finally:
+        phases[phase] = phases.get(phase, 0.0) + time() - start_time
+
+
+def setup_stubtest_venv(
+    venv_dir: Path,
+    dists_to_install: list[str],
+    pip_env: dict[str, str],
+    *,
+    python: str | None = None,
+    phases: dict[str, float] | None = None,
+) -> None:
+    """Create a venv at `venv_dir`, and install everything stubtest needs into it."""
+    if phases is None:
+        phases = {}
+    uv_command: list[str | Path] = ["uv", "venv", venv_dir, "--seed"]
+    if python is not None:
+        uv_command += ["--python", python]
+    try:
+        with timed(phases, "venv"):
+            subprocess.run(uv_command, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise VenvSetupError("Failed to create a virtualenv (likely a bug in uv?)", e) from None
+    try:
+        with timed(phases, "install"):
+            subprocess.run(pip_command(venv_dir, dists_to_install), env=pip_env, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise VenvSetupError("Failed to install", e) from None
+
+
+def setup_venv(
+    venv_dir: Path,
+    dists_to_install: list[str],
+    install_environment: dict[str, str],
+    pip_env: dict[str, str],
+    *,
+    venv_cache: bool,
+    phases: dict[str, float],
+) -> Path:
+    """Set up the venv for a distribution, and return its path.
+
+    With `venv_cache`, the venv is taken from the venv cache (and `venv_dir` is ignored).
+    """
+    if not venv_cache:
+        setup_stubtest_venv(venv_dir, dists_to_install, pip_env, phases=phases)
+        return venv_dir
+    key = venv_cache_key("stubtest", dists_to_install, install_environment)
+    # The cache key records the running interpreter, so make sure that's the one the venv uses
+    return cached_venv(
+        key,
+        partial(setup_stubtest_venv, dists_to_install=dists_to_install, pip_env=pip_env, python=sys.executable, phases=phases),
+    )
+
+
+def pip_command(venv_dir: Path, dists_to_install: list[str]) -> list[str]:
+    # Use "python -m pip" rather than the pip script, whose shebang breaks if the venv is moved into the venv cache
+    return [str(venv_python(venv_dir)), "-m", "pip", "install", *dists_to_install]
+
+
+def stubtest_fingerprint(dist_name: str) -> str:
+    """Return a fingerprint of everything in typeshed that stubtest's result for a distribution depends on."""
+    return fingerprint(
+        distribution_fingerprint(dist_name), directory_fingerprint(STDLIB_PATH), get_mypy_req(), sys.version, sys.platform
+    )
+
+
+def stubtest_result_key(dist_name: str, python_exe: str) -> str:
+    """Return the key of stubtest's result for a distribution in the result cache.
+
+    Besides the stubs, this covers the versions of all packages installed into the venv,
+    since unpinned requirements may resolve to different versions over time.
+    """
+    installed = subprocess.run(
+        [python_exe, "-m", "pip", "freeze", "--all"], capture_output=True, check=True, text=True
+    ).stdout.splitlines()
+    return fingerprint(stubtest_fingerprint(dist_name), *allowlist_stubtest_arguments(dist_name), *sorted(installed))
+
+
+def run_stubtest(
+    dist: Path,
+    *,
+    verbose: bool = False,
+    ci_platforms_only: bool = False,
+    keep_tmp_dir: bool = False,
+    venv_cache: bool = False,
+    result_cache: ResultCache | None = None,
+    phases: dict[str, float] | None = None,
+) -> bool:
+    """Run stubtest for a single distribution.
+
+    If `phases` is given, the time spent in each of the PHASES is recorded in it.
+    """
+    if phases is None:
+        phases = {}
 
     dist_name = dist.name
     metadata = read_metadata(dist_name)
@@ -59,47 +199,41 @@ def run_stubtest(dist: Path, *, verbose: bool = False, ci_platforms_only: bool =
         return True
 
     tmp = tempfile.mkdtemp(prefix="stubtest-")  # TODO: Python 3.12: Use TemporaryDirectory
-    venv_dir = Path(tmp)
+    # Scratch space for wrapper scripts and the like, which must not end up in a cached venv
+    work_dir = Path(tmp)
+    venv_dir = work_dir / "venv"
     try:
-        try:
-            subprocess.run(["uv", "venv", venv_dir, "--seed"], capture_output=True, check=True)
-        except subprocess.CalledProcessError as e:
-            print_command_failure("Failed to create a virtualenv (likely a bug in uv?)", e)
-            return False
-        if sys.platform == "win32":
-            pip_exe = str(venv_dir / "Scripts" / "pip.exe")
-            python_exe = str(venv_dir / "Scripts" / "python.exe")
-        else:
-            pip_exe = str(venv_dir / "bin" / "pip")
-            python_exe = str(venv_dir / "bin" / "python")
-        dist_extras = ", ".join(stubtest_settings.extras)
-        dist_req = f"{dist_name}[{dist_extras}]{metadata.version_spec}"
-
         requirements = get_recursive_requirements(dist_name)
+        dists_to_install = get_stubtest_install_requirements(dist_name)
 
-        # We need stubtest to be able to import the package, so install mypy into the venv
-        # Hopefully mypy continues to not need too many dependencies
-        # TODO: Maybe find a way to cache these in CI
-        dists_to_install = [dist_req, get_mypy_req()]
-        # Internal requirements are added to MYPYPATH
-        dists_to_install.extend(str(r) for r in requirements.external_pkgs)
-        dists_to_install.extend(stubtest_settings.stubtest_dependencies)
-
-        # Since the "gdb" Python package is available only inside GDB, it is not
-        # possible to install it through pip, so stub tests cannot install it.
-        if dist_name == "gdb":
-            dists_to_install[:] = dists_to_install[1:]
-
-        pip_cmd = [pip_exe, "install", *dists_to_install]
         # Some packages read environment variables at build time, e.g. to
         # opt out of CPU-specific compiler flags. See `install-environment`
         # in CONTRIBUTING.md.
         pip_env = os.environ | stubtest_settings.install_environment
         try:
-            subprocess.run(pip_cmd, env=pip_env, check=True, capture_output=True)
-        except subprocess.CalledProcessError as e:
-            print_command_failure("Failed to install", e)
+            with JobSlots.install:
+                venv_dir = setup_venv(
+                    venv_dir,
+                    dists_to_install,
+                    stubtest_settings.install_environment,
+                    pip_env,
+                    venv_cache=venv_cache,
+                    phases=phases,
+                )
+        except VenvSetupError as e:
+            print_command_failure(e.message, e.error)
             return False
+        python_exe = str(venv_python(venv_dir))
+        pip_cmd = pip_command(venv_dir, dists_to_install)
+
+        result_key = None
+        if result_cache is not None:
+            with timed(phases, "result_cache"):
+                result_key = stubtest_result_key(dist_name, python_exe)
+            if result_cache.passed(result_key):
+                print_time(time() - t)
+                print(colored("success (cached result)", "green"))
+                return True
 
         mypy_configuration = mypy_configuration_from_distribution(dist_name)
         with temporary_mypy_config_file(mypy_configuration, stubtest_settings) as temp:
@@ -142,16 +276,26 @@ def run_stubtest(dist: Path, *, verbose: bool = False, ci_platforms_only: bool =
 
             # Perform some black magic in order to run stubtest inside uWSGI
             if dist_name == "uWSGI":
-                if not setup_uwsgi_stubtest_command(dist, venv_dir, stubtest_cmd):
+                if not setup_uwsgi_stubtest_command(dist, venv_dir, work_dir, stubtest_cmd):
                     return False
 
             if dist_name == "gdb":
-                if not setup_gdb_stubtest_command(venv_dir, stubtest_cmd):
+                if not setup_gdb_stubtest_command(venv_dir, work_dir, stubtest_cmd):
                     return False
 
+            # The uWSGI and gdb wrappers run stubtest themselves, everything else goes through the worker script
+            if stubtest_cmd[1:3] == ["-m", "mypy.stubtest"]:
+                run_cmd = setup_stubtest_worker_command(work_dir, stubtest_cmd)
+            else:
+                run_cmd = stubtest_cmd
+
             try:
-                subprocess.run(stubtest_cmd, env=stubtest_env, check=True, capture_output=True)
+                with JobSlots.stubtest, timed(phases, "stubtest"):
+                    subprocess.run(run_cmd, env=stubtest_env, check=True, capture_output=True)
             except subprocess.CalledProcessError as e:
+                report = read_stubtest_report(work_dir)
+                if report is not None:
+                    phases.update(report.timings)
                 print_time(time() - t)
                 print_error(f"failed with exit code {e.returncode}")
 
@@ -165,12 +309,18 @@ def run_stubtest(dist: Path, *, verbose: bool = False, ci_platforms_only: bool =
 
                 print_divider()
                 print("Python version: ", end="", flush=True)
-                ret = subprocess.run([sys.executable, "-VV"], capture_output=True, check=False)
-                print_command_output(ret)
+                if report is not None:
+                    print(f"Python {report.python_version}")
+                else:
+                    ret = subprocess.run([sys.executable, "-VV"], capture_output=True, check=False)
+                    print_command_output(ret)
 
                 print("\nRan with the following environment:")
-                ret = subprocess.run([pip_exe, "freeze", "--all"], capture_output=True, check=False)
-                print_command_output(ret)
+                if report is not None:
+                    print("\n".join(report.installed))
+                else:
+                    ret = subprocess.run([python_exe, "-m", "pip", "freeze", "--all"], capture_output=True, check=False)
+                    print_command_output(ret)
                 if keep_tmp_dir:
                     print("Path to virtual environment:", venv_dir, flush=True)
 
@@ -179,11 +329,15 @@ def run_stubtest(dist: Path, *, verbose: bool = False, ci_platforms_only: bool =
                 if main_allowlist_path.exists():
                     print(f'To fix "unused allowlist" errors, remove the corresponding entries from {main_allowlist_path}')
                     print()
+                elif report is not None:
+                    print(f"Add the following to {main_allowlist_path}:")
+                    print("\n".join(report.allowlist))
                 else:
                     print(f"Re-running stubtest with --generate-allowlist.\nAdd the following to {main_allowlist_path}:")
-                    ret = subprocess.run(
-                        [*stubtest_cmd, "--generate-allowlist"], env=stubtest_env, capture_output=True, check=False
-                    )
+                    with JobSlots.stubtest, timed(phases, "generate_allowlist"):
+                        ret = subprocess.run(
+                            [*stubtest_cmd, "--generate-allowlist"], env=stubtest_env, capture_output=True, check=False
+                        )
                     print_command_output(ret)
 
                 print_divider()
@@ -194,8 +348,13 @@ def run_stubtest(dist: Path, *, verbose: bool = False, ci_platforms_only: bool =
 
                 return False
             else:
+                report = read_stubtest_report(work_dir)
+                if report is not None:
+                    phases.update(report.timings)
                 print_time(time() - t)
                 print_success_msg()
+                if result_cache is not None and result_key is not None:
+                    result_cache.record_pass(result_key)
 
                 if sys.platform not in stubtest_settings.ci_platforms:
                     print_warning(f"Note: {dist_name} is not currently tested on {sys.platform} in typeshed's CI")
@@ -205,7 +364,7 @@ def run_stubtest(dist: Path, *, verbose: bool = False, ci_platforms_only: bool =
 
     finally:
         if not keep_tmp_dir:
-            rmtree(venv_dir)
+            rmtree(work_dir)
 
     if verbose:
         print_commands(pip_cmd, stubtest_cmd, mypypath)
@@ -213,7 +372,135 @@ def run_stubtest(dist: Path, *, verbose: bool = False, ci_platforms_only: bool =
     return True
 
 
-def setup_gdb_stubtest_command(venv_dir: Path, stubtest_cmd: list[str]) -> bool:
+def init_worker(install_slots: AbstractContextManager[Any], stubtest_slots: AbstractContextManager[Any]) -> None:
+    JobSlots.install = install_slots
+    JobSlots.stubtest = stubtest_slots
+
+
+class StubtestRun(NamedTuple):
+    distribution: str
+    success: bool
+    duration: float  # In seconds, including any time spent waiting for other jobs
+    phases: dict[str, float]  # Time spent in each of the PHASES
+    output: str  # Everything that was printed, if the output was captured
+
+
+def run_stubtest_timed(run: Callable[..., bool], dist: Path, *, capture_output: bool = False) -> StubtestRun:
+    """Run stubtest for a single distribution, and time it.
+
+    With --jobs, this is executed in a worker process with `capture_output`,
+    so redirecting stdout does not affect other distributions.
+    """
+    phases: dict[str, float] = {}
+    output = io.StringIO()
+    start_time = time()
+    with redirect_stdout(output) if capture_output else nullcontext():
+        success = run(dist, phases=phases)
+    return StubtestRun(dist.name, success, time() - start_time, phases, output.getvalue())
+
+
+def write_timings(path: Path, runs: list[StubtestRun]) -> None:
+    """Write the timings of all runs to a JSON lines file, one distribution per line."""
+    with path.open("w", encoding="UTF-8") as f:
+        for run in runs:
+            timings = {"distribution": run.distribution, "success": run.success, "duration": run.duration, "phases": run.phases}
+            f.write(json.dumps(timings) + "\n")
+
+
+def print_timing_summary(runs: list[StubtestRun], slowest: int) -> None:
+    print_divider()
+    totals = {phase: sum(run.phases.get(phase, 0.0) for run in runs) for phase in PHASES}
+    print("Total time per phase:", ", ".join(f"{phase} {total:.1f} s" for phase, total in totals.items() if total))
+    print(f"\nSlowest {min(slowest, len(runs))} distributions:")
+    for run in sorted(runs, key=lambda run: run.duration, reverse=True)[:slowest]:
+        phases = ", ".join(f"{phase} {run.phases[phase]:.1f} s" for phase in PHASES if phase in run.phases)
+        print(f"  {run.distribution}: {run.duration:.1f} s ({phases})")
+
+
+class StubtestReport(NamedTuple):
+    """Information about a stubtest run, written by the worker script."""
+
+    python_version: str
+    installed: list[str]  # All installed packages, as "name==version"
+    allowlist: list[str]  # Allowlist entries for all errors stubtest reported
+    timings: dict[str, float]  # Time spent in the "mypy_build" and "runtime_check" phases
+
+
+def setup_stubtest_worker_command(work_dir: Path, stubtest_cmd: list[str]) -> list[str]:
+    """Return a command that runs stubtest through a worker script, which also writes a StubtestReport.
+
+    This saves running stubtest a second time with --generate-allowlist (and running
+    pip freeze) when stubtest fails, since all the information is gathered in one go.
+    """
+    worker_script = work_dir / "stubtest_worker.py"
+    report_file = work_dir / "stubtest_report.json"
+    worker_script_contents = dedent(f"""
+        import json
+        import sys
+        import time
+        from importlib import metadata
+
+        from mypy import stubtest
+
+        # stubtest reports errors using Error.get_description(), so record the
+        # allowlist entry of every error that is reported
+        generated_allowlist = set()
+        get_description = stubtest.Error.get_description
+
+        def record_error(self, concise=False):
+            generated_allowlist.add(self.object_desc)
+            return get_description(self, concise=concise)
+
+        stubtest.Error.get_description = record_error
+
+        # Separate the time spent building the stubs with mypy from the time spent
+        # importing the runtime package and comparing it to the stubs
+        build_time = 0.0
+        build_stubs = stubtest.build_stubs
+
+        def timed_build_stubs(*args, **kwargs):
+            global build_time
+            start_time = time.perf_counter()
+            try:
+                return build_stubs(*args, **kwargs)
+            finally:
+                build_time = time.perf_counter() - start_time
+
+        stubtest.build_stubs = timed_build_stubs
+        exit_code = 1
+        start_time = time.perf_counter()
+        try:
+            exit_code = stubtest.main()
+        finally:
+            report = {{
+                "python_version": sys.version,
+                "installed": sorted(f"{{dist.name}}=={{dist.version}}" for dist in metadata.distributions()),
+                "allowlist": sorted(generated_allowlist),
+                "timings": {{
+                    "mypy_build": build_time,
+                    "runtime_check": time.perf_counter() - start_time - build_time,
+                }},
+            }}
+            with open({str(report_file)!r}, mode="w") as fp:
+                json.dump(report, fp)
+        sys.exit(exit_code)
+        """)
+    worker_script.write_text(worker_script_contents)
+
+    # replace "-m mypy.stubtest" in stubtest_cmd with the path to the worker script
+    assert stubtest_cmd[1:3] == ["-m", "mypy.stubtest"]
+    return [stubtest_cmd[0], str(worker_script), *stubtest_cmd[3:]]
+
+
+def read_stubtest_report(work_dir: Path) -> StubtestReport | None:
+    """Return the report written by the worker script, or None if there is none (e.g. if stubtest crashed)."""
+    try:
+        return StubtestReport(**json.loads((work_dir / "stubtest_report.json").read_text()))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def setup_gdb_stubtest_command(venv_dir: Path, work_dir: Path, stubtest_cmd: list[str]) -> bool:
     """
     Use wrapper scripts to run stubtest inside gdb.
     The wrapper script is used to pass the arguments to the gdb script.
@@ -225,8 +512,8 @@ def setup_gdb_stubtest_command(venv_dir: Path, stubtest_cmd: list[str]) -> bool:
     if not gdb_version_check():
         return False
 
-    gdb_script = venv_dir / "gdb_stubtest.py"
-    wrapper_script = venv_dir / "gdb_wrapper.py"
+    gdb_script = work_dir / "gdb_stubtest.py"
+    wrapper_script = work_dir / "gdb_wrapper.py"
     gdb_script_contents = dedent(f"""
         import json
         import os
@@ -306,7 +593,7 @@ def gdb_version_check() -> bool:
     return True
 
 
-def setup_uwsgi_stubtest_command(dist: Path, venv_dir: Path, stubtest_cmd: list[str]) -> bool:
+def setup_uwsgi_stubtest_command(dist: Path, venv_dir: Path, work_dir: Path, stubtest_cmd: list[str]) -> bool:
     """Perform some black magic in order to run stubtest inside uWSGI.
 
     We have to write the exit code from stubtest to a surrogate file
@@ -315,10 +602,9 @@ def setup_uwsgi_stubtest_command(dist: Path, venv_dir: Path, stubtest_cmd: list[
     arguments along to the uWSGI script and retrieves the exit code
     from the file, so it behaves like running stubtest normally would.
 
-    Both generated wrapper scripts are created inside `venv_dir`,
-    which itself is a subdirectory inside a temporary directory,
-    so both scripts will be cleaned up after this function
-    has been executed.
+    Both generated wrapper scripts are created inside `work_dir`,
+    which is a temporary directory, so both scripts will be cleaned
+    up after this function has been executed.
     """
     uwsgi_ini = tests_path(dist.name) / "uwsgi.ini"
 
@@ -326,9 +612,9 @@ def setup_uwsgi_stubtest_command(dist: Path, venv_dir: Path, stubtest_cmd: list[
         print_error("uWSGI is not supported on Windows")
         return False
 
-    uwsgi_script = venv_dir / "uwsgi_stubtest.py"
-    wrapper_script = venv_dir / "uwsgi_wrapper.py"
-    exit_code_surrogate = venv_dir / "exit_code"
+    uwsgi_script = work_dir / "uwsgi_stubtest.py"
+    wrapper_script = work_dir / "uwsgi_wrapper.py"
+    exit_code_surrogate = work_dir / "exit_code"
     uwsgi_script_contents = dedent(f"""
         import json
         import os
@@ -362,7 +648,7 @@ def setup_uwsgi_stubtest_command(dist: Path, venv_dir: Path, stubtest_cmd: list[
             "--ini",
             "{uwsgi_ini}",
             "--spooler",
-            "{venv_dir}",
+            "{work_dir}",
             "--pyrun",
             "{uwsgi_script}",
         ]
@@ -399,34 +685,182 @@ def print_command_output(e: subprocess.CalledProcessError | subprocess.Completed
 def main() -> Never:
     parser = argparse.ArgumentParser()
     parser.add_argument("-v", "--verbose", action="store_true", help="verbose output")
-    parser.add_argument("--num-shards", type=int, default=1)
-    parser.add_argument("--shard-index", type=int, default=0)
+    parser.add_argument(
+        "--num-shards",
+        type=positive_int,
+        default=1,
+        help="split the distributions into this many shards, balanced using the durations from --durations",
+    )
+    parser.add_argument("--shard-index", type=int, default=0, help="the (0-based) index of the shard to run")
+    parser.add_argument(
+        "--durations",
+        metavar="FILE",
+        type=Path,
+        help="ledger file of an earlier run, whose durations are used to balance the shards; it is only read, "
+        "so that all shards agree on the split (without it, the shards have about the same number of distributions)",
+    )
+    parser.add_argument(
+        "--ledger",
+        type=Path,
+        default=STUBTEST_LEDGER_PATH,
+        help="JSON file in which the result and duration of each distribution is recorded (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip distributions that passed in an earlier run (according to the ledger) and whose stubs haven't changed since",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=1,
+        help=(
+            "run stubtest for up to this many distributions concurrently (defaults to 1); "
+            "the output for each distribution is printed in one piece"
+        ),
+    )
+    parser.add_argument(
+        "--install-jobs",
+        type=positive_int,
+        help="with --jobs, set up at most this many virtualenvs concurrently (defaults to the value of --jobs)",
+    )
     parser.add_argument(
         "--ci-platforms-only",
         action="store_true",
         help="skip the test if the current platform is not specified in METADATA.toml/tool.stubtest.ci-platforms",
     )
     parser.add_argument("--keep-tmp-dir", action="store_true", help="keep the temporary virtualenv")
+    parser.add_argument(
+        "--venv-cache", action="store_true", help="reuse the virtualenvs across runs; they are kept in .typeshed_cache/venvs"
+    )
+    parser.add_argument(
+        "--result-cache",
+        action="store_true",
+        help="don't run stubtest again for distributions that passed with the same stubs, allowlists and installed packages; "
+        "results are kept in .typeshed_cache/results/stubtest",
+    )
+    parser.add_argument(
+        "--timings",
+        metavar="FILE",
+        type=Path,
+        help="write the time spent in each phase of every distribution's run to this file (as JSON lines), "
+        "and print a summary at the end",
+    )
+    parser.add_argument(
+        "--slowest",
+        metavar="N",
+        type=positive_int,
+        default=10,
+        help="with --timings, list this many of the slowest distributions in the summary (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--wheelhouse",
+        metavar="DIR",
+        type=wheelhouse_directory,
+        help="install everything from this directory only, without accessing the package index "
+        "(build it with scripts/build_wheelhouse.py)",
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help="only test distributions affected by changes since the merge base with this git ref (e.g. origin/main)",
+    )
     parser.add_argument("dists", metavar="DISTRIBUTION", type=str, nargs=argparse.ZERO_OR_MORE)
     args = parser.parse_args()
-
-    if len(args.dists) == 0:
+    if not 0 <= args.shard_index < args.num_shards:
+        parser.error(f"--shard-index must be between 0 and {args.num_shards - 1} (the number of shards minus one)")
+    durations: dict[str, float] = {}
+    if args.durations is not None:
+        if args.durations.resolve() == args.ledger.resolve():
+            parser.error("--durations must not be the ledger that this run records to")
+        try:
+            durations = read_durations(args.durations)
+        except (OSError, ValueError) as e:
+            parser.error(f"Cannot read the durations: {e}")
+    if args.wheelhouse is not None:
+        use_wheelhouse(args.wheelhouse)
+
+    if args.changed_since is not None:
+        if args.dists:
+            parser.error("Cannot specify both --changed-since and distributions to test")
+        try:
+            affected = stubs_affected_by_changes(args.changed_since)
+        except ValueError as e:
+            parser.error(str(e))
+        dists = [STUBS_PATH / d for d in sorted(affected.distributions)]
+    elif len(args.dists) == 0:
         dists = sorted(STUBS_PATH.iterdir())
     else:
         dists = [STUBS_PATH / d for d in args.dists]
 
-    result = 0
-    for i, dist in enumerate(dists):
-        if i % args.num_shards != args.shard_index:
-            continue
+    ledger = Ledger(args.ledger)
+    if args.num_shards > 1:
+        shard = balanced_shards([dist.name for dist in dists], durations, args.num_shards)[args.shard_index]
+        print(
+            f"Shard {args.shard_index + 1} of {args.num_shards}: {len(shard.items)} distributions, "
+            f"expected to take {shard.expected_duration:.0f} seconds"
+        )
+        dists = [dist for dist in dists if dist.name in shard.items]
+
+    fingerprints: dict[str, str] = {}
+    dists_to_run: list[Path] = []
+    for dist in dists:
         try:
-            if not run_stubtest(
-                dist, verbose=args.verbose, ci_platforms_only=args.ci_platforms_only, keep_tmp_dir=args.keep_tmp_dir
-            ):
-                result = 1
+            dist_fingerprint = stubtest_fingerprint(dist.name)
         except NoSuchStubError as e:
             parser.error(str(e))
-    sys.exit(result)
+        if args.resume and ledger.passed(dist.name, dist_fingerprint):
+            print(f"{dist.name}... {colored('skipping (passed in an earlier run)', 'yellow')}")
+            continue
+        fingerprints[dist.name] = dist_fingerprint
+        dists_to_run.append(dist)
+
+    run = partial(
+        run_stubtest,
+        verbose=args.verbose,
+        ci_platforms_only=args.ci_platforms_only,
+        keep_tmp_dir=args.keep_tmp_dir,
+        venv_cache=args.venv_cache,
+        result_cache=ResultCache("stubtest") if args.result_cache else None,
+    )
+    runs: list[StubtestRun] = []
+
+    def record(run_result: StubtestRun) -> None:
+        print(run_result.output, end="", flush=True)
+        ledger.record(
+            run_result.distribution,
+            success=run_result.success,
+            duration=run_result.duration,
+            fingerprint=fingerprints[run_result.distribution],
+        )
+        runs.append(run_result)
+
+    sequential_dists = dists_to_run
+    if args.jobs > 1:
+        concurrent_dists = [dist for dist in dists_to_run if dist.name not in EXCLUSIVE_DISTRIBUTIONS]
+        sequential_dists = [dist for dist in dists_to_run if dist.name in EXCLUSIVE_DISTRIBUTIONS]
+        install_jobs = args.install_jobs or args.jobs
+        slots = (multiprocessing.Semaphore(install_jobs), multiprocessing.Semaphore(args.jobs))
+        # Enough workers that venvs can be set up for some distributions while stubtest runs for others
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=args.jobs + install_jobs, initializer=init_worker, initargs=slots
+        ) as executor:
+            futures = [executor.submit(run_stubtest_timed, run, dist, capture_output=True) for dist in concurrent_dists]
+            for future in concurrent.futures.as_completed(futures):
+                record(future.result())
+
+    for dist in sequential_dists:
+        record(run_stubtest_timed(run, dist))
+
+    if args.timings is not None:
+        write_timings(args.timings, runs)
+        print_timing_summary(runs, args.slowest)
+    if args.venv_cache:
+        prune_venv_cache()
+    if args.result_cache:
+        ResultCache("stubtest").prune()
+    sys.exit(0 if all(run_result.success for run_result in runs) else 1)
 
 
 if __name__ == "__main__":
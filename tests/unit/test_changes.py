@@ -0,0 +1,32 @@
+"""Tests for ts_utils.changes."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from ts_utils import changes
+from ts_utils.metadata import get_dependency_graph
+
+
+@pytest.fixture
+def empty_typeshed(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """Run the test in an empty typeshed checkout, with a fresh dependency graph."""
+    (tmp_path / ".gitignore").write_text("", encoding="UTF-8")
+    (tmp_path / "stubs").mkdir()
+    monkeypatch.chdir(tmp_path)
+    get_dependency_graph.cache_clear()
+    yield tmp_path
+    get_dependency_graph.cache_clear()
+
+
+def test_distribution_without_metadata(empty_typeshed: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    stub_path = Path("stubs", "new-dist", "new_dist.pyi")
+    (empty_typeshed / stub_path).parent.mkdir()
+    (empty_typeshed / stub_path).touch()
+    monkeypatch.setattr(changes, "get_changed_paths", lambda _ref: [stub_path])
+
+    affected = changes.stubs_affected_by_changes("main")
+    assert affected == changes.AffectedStubs(stdlib=False, distributions=frozenset({"new-dist"}), all_distributions=True)
@@ -0,0 +1,59 @@
+"""Tests for ts_utils.fingerprints."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from ts_utils.fingerprints import directory_fingerprint, distribution_fingerprint, fingerprint
+
+
+@pytest.fixture(autouse=True)
+def clear_fingerprint_cache() -> Iterator[None]:
+    directory_fingerprint.cache_clear()
+    yield
+    directory_fingerprint.cache_clear()
+
+
+def test_fingerprint_separates_parts() -> None:
+    assert fingerprint("a", "b") == fingerprint("a", "b")
+    assert fingerprint("a", "b") != fingerprint("ab")
+    assert fingerprint("a", "b") != fingerprint("b", "a")
+
+
+def test_directory_fingerprint(tmp_path: Path) -> None:
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.pyi").write_text("x: int\n", encoding="UTF-8")
+    original = directory_fingerprint(tmp_path)
+
+    # Generated files are ignored
+    (tmp_path / "pkg" / "__pycache__").mkdir()
+    (tmp_path / "pkg" / "__pycache__" / "x.pyc").write_bytes(b"\0")
+    directory_fingerprint.cache_clear()
+    assert directory_fingerprint(tmp_path) == original
+
+    # A directory named venv isn't generated (think of stdlib/venv)
+    (tmp_path / "venv").mkdir()
+    (tmp_path / "venv" / "__init__.pyi").touch()
+    directory_fingerprint.cache_clear()
+    with_venv = directory_fingerprint(tmp_path)
+    assert with_venv != original
+
+    # Both the contents and the names of files matter
+    (tmp_path / "pkg" / "__init__.pyi").write_text("x: str\n", encoding="UTF-8")
+    directory_fingerprint.cache_clear()
+    assert directory_fingerprint(tmp_path) != with_venv
+    (tmp_path / "pkg" / "__init__.pyi").rename(tmp_path / "pkg" / "mod.pyi")
+    directory_fingerprint.cache_clear()
+    assert directory_fingerprint(tmp_path) != with_venv
+
+
+def test_distribution_fingerprint_covers_dependencies() -> None:
+    # PyAutoGUI depends on the stubs of PyScreeze
+    expected = fingerprint(
+        f"PyAutoGUI={directory_fingerprint(Path('stubs/PyAutoGUI'))}",
+        f"PyScreeze={directory_fingerprint(Path('stubs/PyScreeze'))}",
+    )
+    assert distribution_fingerprint("PyAutoGUI") == expected
@@ -0,0 +1,69 @@
+"""Tests for ts_utils.imports and for selecting test cases by their imports in ts_utils.changes."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from ts_utils import changes
+from ts_utils.imports import imported_stub_files
+from ts_utils.utils import distribution_info
+
+
+def write_file(path: Path, source: str) -> Path:
+    path.write_text(source, encoding="UTF-8")
+    return path
+
+
+def test_stdlib_imports(tmp_path: Path) -> None:
+    stub_files = imported_stub_files(write_file(tmp_path / "check_asyncio.py", "import asyncio\n"))
+    assert stub_files is not None
+    # asyncio/__init__.pyi imports its submodules
+    assert Path("stdlib/asyncio/tasks.pyi") in stub_files
+    # Modules that mypy always loads
+    assert Path("stdlib/builtins.pyi") in stub_files
+    assert Path("stubs/mypy-extensions/mypy_extensions.pyi") in stub_files
+    # Modules that nothing imports
+    assert Path("stdlib/tkinter/__init__.pyi") not in stub_files
+
+
+def test_from_import_of_submodule(tmp_path: Path) -> None:
+    stub_files = imported_stub_files(write_file(tmp_path / "check_xml.py", "from xml.etree import ElementTree\n"))
+    assert stub_files is not None
+    assert Path("stdlib/xml/etree/ElementTree.pyi") in stub_files
+    assert Path("stdlib/xml/__init__.pyi") in stub_files
+
+
+def test_third_party_imports(tmp_path: Path) -> None:
+    test_case = write_file(tmp_path / "check_pyautogui.py", "import pyautogui\n")
+    stub_files = imported_stub_files(test_case, "PyAutoGUI")
+    assert stub_files is not None
+    assert Path("stubs/PyAutoGUI/pyautogui/__init__.pyi") in stub_files
+    # A typeshed dependency of PyAutoGUI
+    assert Path("stubs/PyScreeze/pyscreeze/__init__.pyi") in stub_files
+
+    # Third-party stubs aren't visible to the stdlib test cases
+    stub_files = imported_stub_files(test_case)
+    assert stub_files is not None
+    assert not any(path.is_relative_to("stubs/PyAutoGUI") for path in stub_files)
+
+
+def test_unparseable_file(tmp_path: Path) -> None:
+    assert imported_stub_files(write_file(tmp_path / "check_broken.py", "def broken(:\n")) is None
+
+
+def test_testcases_affected_by_changes() -> None:
+    stdlib = distribution_info("stdlib")
+    changed_stub = Path("stdlib/asyncio/tasks.pyi")
+    affected = changes.testcases_affected_by_changes(stdlib, [changed_stub])
+    assert affected is not None
+    assert stdlib.test_cases_path / "asyncio" / "check_task.py" in affected
+    assert stdlib.test_cases_path / "check_re.py" not in affected
+
+    # A changed test case only selects itself
+    changed_test_case = stdlib.test_cases_path / "check_re.py"
+    assert changes.testcases_affected_by_changes(stdlib, [changed_test_case]) == [changed_test_case]
+
+    # Other packages' test cases don't matter, but changes outside the stubs select everything
+    assert changes.testcases_affected_by_changes(stdlib, [Path("stubs/six/@tests/test_cases/check_six.py")]) == []
+    assert changes.testcases_affected_by_changes(stdlib, [Path("tests/regr_test.py")]) is None
+    assert changes.testcases_affected_by_changes(stdlib, [Path("stdlib/VERSIONS")]) is None
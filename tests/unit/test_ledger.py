@@ -0,0 +1,77 @@
+"""Tests for ts_utils.ledger."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from ts_utils.ledger import Ledger, LedgerEntry, Shard, balanced_shards, expected_durations, read_durations
+
+
+def test_ledger_round_trip(tmp_path: Path) -> None:
+    path = tmp_path / "ledger.json"
+    ledger = Ledger(path)
+    ledger.record("a", success=True, duration=2.0, fingerprint="fp-a")
+    ledger.record("b", success=False, duration=1.0, fingerprint="fp-b")
+
+    reloaded = Ledger(path)
+    assert reloaded.get("a") == LedgerEntry(success=True, duration=2.0, fingerprint="fp-a")
+    assert reloaded.durations() == {"a": 2.0, "b": 1.0}
+    assert reloaded.passed("a", "fp-a")
+    assert not reloaded.passed("a", "other-fp")
+    assert not reloaded.passed("b", "fp-b")
+    assert not reloaded.passed("c", "fp-c")
+
+
+def test_corrupt_ledger_starts_from_scratch(tmp_path: Path) -> None:
+    path = tmp_path / "ledger.json"
+    path.write_text("{not json", encoding="UTF-8")
+    assert Ledger(path).durations() == {}
+
+
+def test_read_durations(tmp_path: Path) -> None:
+    path = tmp_path / "ledger.json"
+    Ledger(path).record("a", success=True, duration=2.5, fingerprint="fp")
+    assert read_durations(path) == {"a": 2.5}
+
+    path.write_text(json.dumps({"a": 2.5}), encoding="UTF-8")
+    with pytest.raises(ValueError, match="not a ledger file"):
+        read_durations(path)
+
+
+def test_expected_durations() -> None:
+    # Unknown items take the median of the known durations; ties are sorted by name
+    expected = expected_durations(["a", "b", "c", "d"], {"a": 1.0, "b": 5.0, "c": 3.0})
+    assert list(expected.items()) == [("b", 5.0), ("c", 3.0), ("d", 3.0), ("a", 1.0)]
+
+    assert expected_durations(["b", "a"], {}) == {"a": 1.0, "b": 1.0}
+
+
+def test_balanced_shards() -> None:
+    durations = {"a": 8.0, "b": 5.0, "c": 4.0, "d": 3.0, "e": 1.0}
+    shards = balanced_shards(list(durations), durations, 2)
+    assert shards == [Shard(["a", "d"], 11.0), Shard(["b", "c", "e"], 10.0)]
+
+
+def test_balanced_shards_cover_every_item_once() -> None:
+    items = [f"d{i:02}" for i in range(20)]
+    durations = {item: float(i % 7) + 0.5 for i, item in enumerate(items)}
+    for num_shards in (1, 3, 25):
+        shards = balanced_shards(items, durations, num_shards)
+        assert len(shards) == num_shards
+        assert sorted(item for shard in shards for item in shard.items) == items
+
+
+def test_balanced_shards_only_depend_on_the_durations(tmp_path: Path) -> None:
+    # Recording results in a ledger doesn't change the split, since it's computed from a separate, fixed history
+    history = tmp_path / "history.json"
+    history_ledger = Ledger(history)
+    for item, duration in {"d01": 1.0, "d02": 2.0, "d03": 3.0}.items():
+        history_ledger.record(item, success=True, duration=duration, fingerprint="fp")
+    items = ["d01", "d02", "d03", "d04"]
+
+    first_split = balanced_shards(items, read_durations(history), 2)
+    Ledger(tmp_path / "ledger.json").record("d01", success=True, duration=100.0, fingerprint="fp")
+    assert balanced_shards(items, read_durations(history), 2) == first_split
@@ -0,0 +1,35 @@
+"""Tests for ts_utils.metadata."""
+
+from __future__ import annotations
+
+from ts_utils.metadata import DependencyGraph
+
+
+def test_dependency_graph_without_cycles() -> None:
+    # a -> b -> c, and d -> c
+    graph = DependencyGraph.from_dependencies({"a": ["b"], "b": ["c"], "d": ["c"]})
+
+    assert graph.dependencies == {"a": {"b"}, "b": {"c"}, "c": set(), "d": {"c"}}
+    assert graph.dependents == {"a": set(), "b": {"a"}, "c": {"b", "d"}, "d": set()}
+    assert graph.transitive_dependencies == {"a": {"b", "c"}, "b": {"c"}, "c": set(), "d": {"c"}}
+    assert graph.transitive_dependents == {"a": set(), "b": {"a"}, "c": {"a", "b", "d"}, "d": set()}
+    assert graph.topological_order == ("c", "b", "a", "d")
+    assert graph.strongly_connected_components == (frozenset("c"), frozenset("b"), frozenset("a"), frozenset("d"))
+
+
+def test_dependency_graph_with_cycle() -> None:
+    # a -> b <-> c -> d
+    graph = DependencyGraph.from_dependencies({"a": ["b"], "b": ["c"], "c": ["b", "d"], "d": []})
+
+    assert graph.strongly_connected_components == (frozenset("d"), frozenset("bc"), frozenset("a"))
+    assert graph.topological_order == ("d", "b", "c", "a")
+    # The members of a cycle depend on each other, and on themselves
+    assert graph.transitive_dependencies == {"a": {"b", "c", "d"}, "b": {"b", "c", "d"}, "c": {"b", "c", "d"}, "d": set()}
+    assert graph.transitive_dependents == {"a": set(), "b": {"a", "b", "c"}, "c": {"a", "b", "c"}, "d": {"a", "b", "c"}}
+
+
+def test_dependency_graph_self_dependency() -> None:
+    graph = DependencyGraph.from_dependencies({"a": ["a"]})
+
+    assert graph.transitive_dependencies == {"a": {"a"}}
+    assert graph.transitive_dependents == {"a": {"a"}}
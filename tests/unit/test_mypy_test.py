@@ -0,0 +1,23 @@
+"""Tests for mypy_test.py."""
+
+from __future__ import annotations
+
+from mypy_test import attribute_mypy_output, can_share_invocation
+
+DEPENDENCY_ERROR = "stubs/PyScreeze/pyscreeze/__init__.pyi:1: error: Dependency error  [misc]"
+DEPENDENT_ERROR = "stubs/PyAutoGUI/pyautogui/__init__.pyi:1: error: Dependent error  [misc]"
+SUMMARY = "Found 2 errors in 2 files (checked 3 source files)"
+
+
+def test_batch_with_dependency() -> None:
+    # PyAutoGUI depends on PyScreeze, and six is unrelated to either
+    distributions = ["PyAutoGUI", "PyScreeze", "six"]
+    assert can_share_invocation(distributions)
+
+    lines = attribute_mypy_output(f"{DEPENDENCY_ERROR}\n{DEPENDENT_ERROR}\n{SUMMARY}\n", distributions)
+    assert lines == {
+        # Checked on its own, PyAutoGUI also sees the errors in PyScreeze
+        "PyAutoGUI": [DEPENDENCY_ERROR, DEPENDENT_ERROR, SUMMARY],
+        "PyScreeze": [DEPENDENCY_ERROR, SUMMARY],
+        "six": [SUMMARY],
+    }